@@ -2,35 +2,153 @@
 # -*- coding: utf-8 -*-
 
 import asyncio
-import concurrent.futures
+import copy
 import os
+import time
 from contextlib import asynccontextmanager
+from typing import Dict, Optional
 
-from config import JOBQUEUE_MAX_JOBS, JOBQUEUE_PER_JOB_CONCURRENCY, logger
-from db import Base, engine, get_db
+from auth import hash_password
+import cachetools
+from config import (
+    JOBQUEUE_JOB_TTL,
+    JOBQUEUE_MAX_JOBS,
+    JOBQUEUE_MAX_TRACKED_JOBS,
+    JOBQUEUE_PER_JOB_CONCURRENCY,
+    RESULT_CACHE_SIZE,
+    RESULT_CACHE_TTL_LIVE,
+    RESULT_CACHE_TTL_TYPICAL,
+    SELENIUM_MAX_SESSIONS,
+    SELENIUM_URL,
+    logger,
+)
+from db import AsyncSessionLocal, Base, engine
+import httpx
 from fastapi import FastAPI
 from jobs import JobQueue
 from models_db import User
-from sqlalchemy import select
-from sqlalchemy.util import md5_hex
-from step2_traffic_analysis import analyze_location_traffic
+from selenium import webdriver
+from sqlalchemy import func, select
+from step2_traffic_analysis import (
+    DriverPool,
+    analyze_location_traffic,
+    is_webdriver_error,
+)
+from utils import job_writer, persist_job
 
-# Thread pool for CPU-intensive operations
-thread_pool = concurrent.futures.ThreadPoolExecutor(max_workers=20)
 
+class SeleniumSessionPool:
+    """
+    Bounded pool of warm Selenium Grid sessions, keyed by proxy.
+    Sessions are created lazily (up to `size`) and handed back to the pool
+    after each location instead of being quit, so a location only pays the
+    browser start-up cost the first time a slot is used.
 
-async def run_single_location_blocking(
-    lat,
-    lng,
-    storefront_direction,
-    day_of_week,
-    target_time,
-    proxy=None,
+    The sessions live in a DriverPool; slots are taken here first so that its
+    blocking calls only ever run in worker threads once one is free.
+    """
+
+    def __init__(self, size: int, selenium_url: str):
+        self.size = size
+        self.selenium_url = selenium_url
+
+        self._slots = asyncio.Semaphore(size)
+        self._pool = DriverPool(size)
+
+    @property
+    def discarded(self) -> int:
+        """Sessions quit as broken, for monitoring"""
+        return self._pool.discarded
+
+    async def acquire(self, proxy: Optional[str] = None) -> webdriver.Remote:
+        """Borrow a session for `proxy`, creating one if none is idle"""
+        await self._slots.acquire()
+        # Shielded: a canceled caller must not lose the session its thread starts
+        starting = asyncio.ensure_future(
+            asyncio.to_thread(self._pool.acquire, self.selenium_url, proxy)
+        )
+        try:
+            return await asyncio.shield(starting)
+        except BaseException:
+            self._slots.release()
+            starting.add_done_callback(self._quit_abandoned)
+            raise
+
+    def _quit_abandoned(self, starting: asyncio.Future) -> None:
+        """Quit a session started for an acquire() that was canceled meanwhile"""
+        if starting.cancelled() or starting.exception() is not None:
+            return
+        asyncio.get_running_loop().run_in_executor(
+            None, self._pool.discard, starting.result()
+        )
+
+    async def release(self, driver: webdriver.Remote) -> None:
+        """Reset a session and return it to the pool, or quit it if it is broken"""
+        try:
+            # Shielded so the session is returned or quit even if we are canceled
+            await asyncio.shield(asyncio.to_thread(self._pool.release, driver))
+        finally:
+            self._slots.release()
+
+    async def discard(self, driver: webdriver.Remote) -> None:
+        """Quit a session that should not be reused"""
+        try:
+            await asyncio.shield(asyncio.to_thread(self._pool.discard, driver))
+        finally:
+            self._slots.release()
+
+    async def close(self) -> None:
+        """Quit every idle session"""
+        await asyncio.to_thread(self._pool.close)
+
+
+# Never open more sessions than the Grid has slots: extra session requests
+# would only queue on the hub until SE_SESSION_REQUEST_TIMEOUT and fail
+selenium_pool = SeleniumSessionPool(
+    size=min(SELENIUM_MAX_SESSIONS, JOBQUEUE_MAX_JOBS * JOBQUEUE_PER_JOB_CONCURRENCY),
+    selenium_url=SELENIUM_URL,
+)
+
+
+def _result_expiry(key, result, now):
+    """Typical traffic results stay valid far longer than live ones"""
+    if result.get("traffic_type") == "typical":
+        return now + RESULT_CACHE_TTL_TYPICAL
+    return now + RESULT_CACHE_TTL_LIVE
+
+
+# Recent results keyed on a ~11m grid cell and the requested traffic view, so
+# repeated or simultaneous requests for the same storefront share one scrape
+_result_cache: cachetools.TLRUCache = cachetools.TLRUCache(
+    maxsize=RESULT_CACHE_SIZE, ttu=_result_expiry
+)
+_inflight: Dict[tuple, asyncio.Future] = {}
+
+
+def _cache_entry(result: dict) -> dict:
+    """
+    Cached copy of a fresh result. analysis_timestamp only holds for the scrape
+    that produced it, so it is kept as cached_at instead.
+    """
+    entry = copy.deepcopy(result)
+    entry["cached_at"] = entry.pop("analysis_timestamp", time.time())
+    return entry
+
+
+def _from_cache(entry: dict) -> dict:
+    """Result served from the cache: a private copy, marked as such"""
+    result = copy.deepcopy(entry)
+    result["from_cache"] = True
+    return result
+
+
+async def _analyze_location(
+    lat, lng, storefront_direction, day_of_week, target_time, proxy
 ):
+    """Run one Google Maps analysis on a pooled Selenium session"""
+    driver = await selenium_pool.acquire(proxy)
     try:
-        selenium_url = os.getenv("SELENIUM_URL", "http://selenium-hub:4444/wd/hub")
-        result = await asyncio.get_event_loop().run_in_executor(
-            thread_pool,
+        result = await asyncio.to_thread(
             analyze_location_traffic,
             lat,
             lng,
@@ -38,22 +156,91 @@ async def run_single_location_blocking(
             storefront_direction,
             day_of_week,
             target_time,
-            selenium_url,
+            SELENIUM_URL,
             proxy,
+            driver,
         )
+    except Exception as e:
+        # Only a broken session is quit; release() health-checks the others
+        if is_webdriver_error(e):
+            logger.warning(f"Selenium session failed, discarding it: {e}")
+            await selenium_pool.discard(driver)
+        else:
+            await selenium_pool.release(driver)
+        raise
+    except BaseException:
+        # Canceled: the analysis thread may still be driving the session
+        await selenium_pool.discard(driver)
+        raise
+    else:
+        await selenium_pool.release(driver)
+    return result
 
-        logger.info(f"Completed analysis for ({lat}, {lng}): Score {result['score']}")
-        return result
 
-    except Exception as e:
-        logger.error(f"Analysis failed for ({lat}, {lng}): {e}")
+async def run_single_location_blocking(
+    lat,
+    lng,
+    storefront_direction,
+    day_of_week,
+    target_time,
+    proxy=None,
+):
+    key = (round(lat, 4), round(lng, 4), storefront_direction, day_of_week, target_time)
+    while True:
+        cached = _result_cache.get(key)
+        if cached is not None:
+            logger.info(f"Cache hit for ({lat}, {lng})")
+            return _from_cache(cached)
+
+        inflight = _inflight.get(key)
+        if inflight is None:
+            break
+        try:
+            return copy.deepcopy(await asyncio.shield(inflight))
+        except asyncio.CancelledError:
+            if not inflight.cancelled():
+                raise
+            # The request running the scrape was canceled: take over
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        result = await _analyze_location(
+            lat, lng, storefront_direction, day_of_week, target_time, proxy
+        )
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except BaseException as e:
+        future.set_exception(e)
+        future.exception()  # mark retrieved when nobody else is waiting
         raise
+    else:
+        _result_cache[key] = _cache_entry(result)
+        future.set_result(result)
+    finally:
+        del _inflight[key]
+
+    logger.info(f"Completed analysis for ({lat}, {lng}): Score {result['score']}")
+    return copy.deepcopy(result)
+
+
+async def _persist_evicted_job(job_id: str, job: dict) -> None:
+    """Store a finished job dropped from memory before its owner collected it"""
+    try:
+        async with AsyncSessionLocal() as db:
+            await persist_job(db, job_id, job)
+    except Exception as e:
+        logger.warning(f"Failed to persist evicted job {job_id}: {e}")
 
 
 job_queue: JobQueue = JobQueue(
     worker_callable=run_single_location_blocking,
     max_workers=JOBQUEUE_MAX_JOBS,
     per_job_concurrency=JOBQUEUE_PER_JOB_CONCURRENCY,
+    max_tracked_jobs=JOBQUEUE_MAX_TRACKED_JOBS,
+    job_ttl=JOBQUEUE_JOB_TTL,
+    on_evict=_persist_evicted_job,
 )
 
 
@@ -63,16 +250,18 @@ async def lifespan(app: FastAPI):
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
 
-    # Create admin user
-    async for db in get_db():
-        admin_pw = os.getenv("ADMIN_PASSWORD", "123456").strip()
-        result = await db.execute(select(User).filter_by(username="admin"))
-        existing_admin = result.scalar_one_or_none()
-
-        if not existing_admin:
-            db.add(User(username="admin", hashed_password=md5_hex(admin_pw)))
+    # Create admin user on an empty users table
+    async with AsyncSessionLocal() as db:
+        if not await db.scalar(select(func.count()).select_from(User)):
+            admin_pw = os.getenv("ADMIN_PASSWORD", "123456").strip()
+            db.add(User(username="admin", hashed_password=hash_password(admin_pw)))
             await db.commit()
-        break
+
+    # Shared client for outbound HTTP (keeps connections alive between calls)
+    app.state.http = httpx.AsyncClient(timeout=10.0)
+
+    # Start background writer for job row updates
+    await job_writer.start()
 
     # Start job queue
     await job_queue.start()
@@ -82,5 +271,7 @@ async def lifespan(app: FastAPI):
 
     logger.info("Shutting down...")
     await job_queue.stop()
-    thread_pool.shutdown(wait=True)
+    await job_writer.stop()
+    await app.state.http.aclose()
+    await selenium_pool.close()
     logger.info("Cleanup completed")
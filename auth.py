@@ -1,24 +1,43 @@
 #!/usr/bin/python3
 # -*- coding: utf-8 -*-
 
+import asyncio
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 
-from config import ACCESS_TOKEN_EXPIRE_MINUTES, ALGORITHM, SECRET_KEY
+import cachetools
+from config import ACCESS_TOKEN_EXPIRE_MINUTES, ALGORITHM, SECRET_KEY, logger
 from db import get_db
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from models_db import User
+from passlib.context import CryptContext
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.util import md5_hex
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Verified tokens -> (user, exp timestamp). Entries are dropped after a minute
+# so deleted users lose access quickly; expiry is still checked on every hit.
+_token_cache: cachetools.TTLCache = cachetools.TTLCache(maxsize=10_000, ttl=60)
+
+
+# New passwords are hashed with bcrypt. MD5 hex digests from older releases
+# still verify, and are replaced with bcrypt on the next successful login.
+pwd_context = CryptContext(schemes=["bcrypt", "hex_md5"], deprecated="auto")
+
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return md5_hex(plain_password) == hashed_password
+    # Unknown formats (identify() is None) would make verify() raise
+    return bool(pwd_context.identify(hashed_password)) and pwd_context.verify(
+        plain_password, hashed_password
+    )
 
 
 async def authenticate_user(
@@ -28,8 +47,16 @@ async def authenticate_user(
     user = result.scalar_one_or_none()
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    # bcrypt is deliberately slow: keep it off the event loop
+    if not await asyncio.to_thread(verify_password, password, user.hashed_password):
         return None
+
+    if pwd_context.needs_update(user.hashed_password):
+        try:
+            user.hashed_password = await asyncio.to_thread(hash_password, password)
+            await db.commit()
+        except Exception as e:
+            logger.warning(f"Failed to upgrade password hash for {username}: {e}")
     return user
 
 
@@ -45,6 +72,14 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 async def get_current_user(
     token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)
 ):
+    # Clients poll with the same token: skip decoding and the user query
+    cached = _token_cache.get(token)
+    if cached is not None:
+        user, exp = cached
+        if time.time() < exp:
+            return user
+        _token_cache.pop(token, None)
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
@@ -60,6 +95,7 @@ async def get_current_user(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid authentication",
             )
+        _token_cache[token] = (user, payload["exp"])
         return user
     except JWTError:
         raise HTTPException(
@@ -14,6 +14,23 @@ JOBQUEUE_MAX_JOBS = int(os.getenv("JOBQUEUE_MAX_JOBS", 2))  # concurrent jobs
 JOBQUEUE_PER_JOB_CONCURRENCY = int(
     os.getenv("JOBQUEUE_PER_JOB_CONCURRENCY", 20)
 )  # locations per job
+JOBQUEUE_MAX_TRACKED_JOBS = int(
+    os.getenv("JOBQUEUE_MAX_TRACKED_JOBS", 10_000)
+)  # finished jobs kept in memory
+JOBQUEUE_JOB_TTL = int(
+    os.getenv("JOBQUEUE_JOB_TTL", 3600)
+)  # seconds before an uncollected finished job is dropped
+
+# Analysis result cache: typical traffic is a weekly pattern, live traffic is not
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", 10_000))
+RESULT_CACHE_TTL_TYPICAL = int(os.getenv("RESULT_CACHE_TTL_TYPICAL", 24 * 3600))
+RESULT_CACHE_TTL_LIVE = int(os.getenv("RESULT_CACHE_TTL_LIVE", 300))
+
+# Selenium Grid configuration
+SELENIUM_URL = os.getenv("SELENIUM_URL", "http://selenium-hub:4444/wd/hub")
+SELENIUM_MAX_SESSIONS = int(
+    os.getenv("SELENIUM_MAX_SESSIONS", 20)
+)  # Grid slots (nodes x SE_NODE_MAX_SESSIONS); idle pooled sessions hold them too
 
 # DataBase configuration
 DB_FILE = os.getenv("SQLITE_DB_FILE", "traffic.db")
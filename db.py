@@ -3,20 +3,23 @@
 
 from config import DB_URL
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
-from sqlalchemy.orm import declarative_base
+from sqlalchemy.orm import DeclarativeBase
 
 # Convert to async SQLite URL
 async_db_url = DB_URL.replace("sqlite:///", "sqlite+aiosqlite:///")
-engine = create_async_engine(async_db_url, echo=False, future=True)
+# Bulk inserts (TrafficLog rows) go out as multi-row INSERTs of 100 rows
+engine = create_async_engine(
+    async_db_url, echo=False, future=True, insertmanyvalues_page_size=100
+)
 AsyncSessionLocal = async_sessionmaker(
     bind=engine, class_=AsyncSession, expire_on_commit=False
 )
-Base = declarative_base()
+
+
+class Base(DeclarativeBase):
+    pass
 
 
 async def get_db():
     async with AsyncSessionLocal() as session:
-        try:
-            yield session
-        finally:
-            await session.close()
+        yield session
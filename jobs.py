@@ -4,15 +4,30 @@
 
 import asyncio
 import os
+import secrets
 import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from enum import Enum
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
 from urllib.parse import urljoin
 
 from config import logger
 
+# Screenshots are served from here; resolved once instead of per location
+STATIC_ABS = os.path.abspath("static")
 
-class JobStatusEnum(Enum):
+
+def _to_static_url(base: str, path: str) -> str:
+    """Map a file under STATIC_ABS to its URL below `base` (the static root URL)"""
+    if path.startswith(STATIC_ABS + os.sep):
+        rel = path[len(STATIC_ABS) + 1 :]
+    else:
+        rel = os.path.relpath(path, STATIC_ABS)
+    return base + rel.replace(os.sep, "/")
+
+
+class JobStatusEnum(str, Enum):
     CANCELED = "canceled"
     PENDING = "pending"
     RUNNING = "running"
@@ -20,6 +35,9 @@ class JobStatusEnum(Enum):
     DONE = "done"
 
 
+TERMINAL_STATUSES = (JobStatusEnum.DONE, JobStatusEnum.FAILED, JobStatusEnum.CANCELED)
+
+
 class AsyncJobQueue:
     """
     Queue that accepts jobs (each job can contain multiple locations).
@@ -32,6 +50,9 @@ class AsyncJobQueue:
         worker_callable: Callable[..., Dict[str, Any]],
         max_workers: int = 2,
         per_job_concurrency: int = 20,
+        max_tracked_jobs: int = 10_000,
+        job_ttl: float = 3600,
+        on_evict: Optional[Callable[[str, dict], Awaitable[None]]] = None,
     ):
         """
         Args:
@@ -39,30 +60,55 @@ class AsyncJobQueue:
                              signature: worker_callable(lat, lng, storefront_direction, day, time, proxy) -> dict
             max_workers: number of background job worker threads (how many jobs processed concurrently).
             per_job_concurrency: how many locations inside a single job are processed concurrently.
+            max_tracked_jobs: finished jobs beyond this many are evicted, oldest first.
+            job_ttl: seconds a finished job is kept in memory if nobody collects it.
+            on_evict: coroutine function called with (job_id, job) for every finished
+                      job dropped from memory before it was collected, to persist it.
         """
         self.worker_callable = worker_callable
         self.max_workers = max_workers
         self.per_job_concurrency = per_job_concurrency
+        self.max_tracked_jobs = max_tracked_jobs
+        self.job_ttl = job_ttl
+        self.on_evict = on_evict
 
-        self._jobs: Dict[str, Dict] = {}
+        # Finished jobs are moved to the end, so eviction scans oldest first
+        self._jobs: "OrderedDict[str, Dict]" = OrderedDict()
         self._queue: asyncio.Queue = asyncio.Queue()
         self._running = True
         self._workers: List[asyncio.Task] = []
+        self._gc_task: Optional[asyncio.Task] = None
+        self._evict_tasks: Set[asyncio.Task] = set()
+        # Guards every job's active-location count so the limit can change live
+        self._admission = asyncio.Condition()
 
     async def start(self):
         """Start the job queue workers"""
         for i in range(self.max_workers):
             worker = asyncio.create_task(self._worker_loop(), name=f"job-worker-{i}")
             self._workers.append(worker)
+        self._gc_task = asyncio.create_task(self._gc_loop(), name="job-gc")
         logger.info(f"Started {self.max_workers} job workers")
 
     async def stop(self):
         """Stop all job workers"""
         self._running = False
-        for worker in self._workers:
-            worker.cancel()
-        await asyncio.gather(*self._workers, return_exceptions=True)
+        tasks = self._workers + ([self._gc_task] if self._gc_task else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
         self._workers.clear()
+        self._gc_task = None
+
+        # Hand over finished jobs nobody collected before the process exits
+        finished = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job["status"] in TERMINAL_STATUSES
+        ]
+        for job_id in finished:
+            self._evict(job_id)
+        await asyncio.gather(*self._evict_tasks, return_exceptions=True)
 
     async def submit(self, payload: dict) -> str:
         """
@@ -71,17 +117,20 @@ class AsyncJobQueue:
           - other optional: proxy, user info...
         Returns: job_id
         """
-        job_id = os.urandom(8).hex()
+        job_id = secrets.token_hex(8)
         job_record = {
             "status": JobStatusEnum.PENDING,
             "payload": payload,
+            "static_base_url": urljoin(payload.get("request_base_url", "/"), "static/"),
             "result": {"count": 0, "locations": []},
             "error": None,
             "completed": 0,
             "failure": 0,
             "created_at": time.time(),
             "updated_at": time.time(),
-            "cancel_requested": False,
+            "cancel_event": asyncio.Event(),
+            "progress_event": asyncio.Event(),
+            "version": 0,  # bumped on every progress change
             "_logged_to_db": False,
         }
         self._jobs[job_id] = job_record
@@ -96,23 +145,106 @@ class AsyncJobQueue:
         """Remove job from tracking"""
         self._jobs.pop(job_id, None)
 
-    def cancel(self, job_id: str) -> dict | None:
+    async def cancel(self, job_id: str) -> dict | None:
         job = self._jobs.get(job_id)
         if not job:
             return None
 
-        if job["status"] in (
-            JobStatusEnum.DONE,
-            JobStatusEnum.FAILED,
-            JobStatusEnum.CANCELED,
-        ):
+        if job["status"] in TERMINAL_STATUSES:
             return job
 
-        job["cancel_requested"] = True
+        job["cancel_event"].set()
         job["status"] = JobStatusEnum.CANCELED
         job["updated_at"] = time.time()
+        self._finished(job_id)
+        self._notify(job)
         return job
 
+    async def set_concurrency(self, per_job_concurrency: int) -> None:
+        """Change how many locations per job may run at once, effective immediately"""
+        if per_job_concurrency < 1:
+            raise ValueError("per_job_concurrency must be at least 1")
+        async with self._admission:
+            self.per_job_concurrency = per_job_concurrency
+            self._admission.notify_all()
+        logger.info(f"Per-job concurrency set to {per_job_concurrency}")
+
+    @asynccontextmanager
+    async def _location_slot(self, slots: dict):
+        """Hold one of a job's location slots under the current concurrency limit"""
+        async with self._admission:
+            await self._admission.wait_for(
+                lambda: slots["active"] < self.per_job_concurrency
+            )
+            slots["active"] += 1
+        try:
+            yield
+        finally:
+            async with self._admission:
+                slots["active"] -= 1
+                # Waiters of every job share the condition: wake them all
+                self._admission.notify_all()
+
+    @staticmethod
+    def _notify(job: dict) -> None:
+        """Record a progress change and wake everyone waiting on it"""
+        job["version"] += 1
+        job["progress_event"].set()
+        job["progress_event"].clear()
+
+    @staticmethod
+    async def wait_for_progress(job: dict, version: int) -> int:
+        """
+        Wait until the job changed after `version` (a value of job["version"])
+        and return the new version. Returns at once if it already did, so a
+        change made while the caller was busy elsewhere is never missed.
+        """
+        while job["version"] == version:
+            await job["progress_event"].wait()
+        return job["version"]
+
+    def _evict(self, job_id: str) -> None:
+        """Drop a finished job from memory, handing it to on_evict to persist"""
+        job = self._jobs.pop(job_id, None)
+        if job is None or self.on_evict is None:
+            return
+        task = asyncio.create_task(self.on_evict(job_id, job), name=f"evict-{job_id}")
+        self._evict_tasks.add(task)
+        task.add_done_callback(self._evict_tasks.discard)
+
+    def _finished(self, job_id: str) -> None:
+        """Mark a job as finished and evict the oldest finished jobs over the limit"""
+        self._jobs.move_to_end(job_id)
+
+        excess = len(self._jobs) - self.max_tracked_jobs
+        if excess <= 0:
+            return
+
+        stale = []
+        for old_id, old_job in self._jobs.items():
+            if len(stale) >= excess:
+                break
+            if old_job["status"] in TERMINAL_STATUSES:
+                stale.append(old_id)
+        for old_id in stale:
+            self._evict(old_id)
+        logger.info(f"Evicted {len(stale)} finished job(s) from memory")
+
+    async def _gc_loop(self, interval: float = 60):
+        """Drop finished jobs nobody collected within job_ttl"""
+        while self._running:
+            await asyncio.sleep(interval)
+            deadline = time.time() - self.job_ttl
+            expired = [
+                job_id
+                for job_id, job in self._jobs.items()
+                if job["status"] in TERMINAL_STATUSES and job["updated_at"] < deadline
+            ]
+            for job_id in expired:
+                self._evict(job_id)
+            if expired:
+                logger.info(f"Expired {len(expired)} uncollected job(s)")
+
     async def _worker_loop(self):
         """Worker loop to process jobs"""
         while self._running:
@@ -129,86 +261,75 @@ class AsyncJobQueue:
     async def _process_job(self, job_id: str):
         """Process a single job"""
         job = self._jobs.get(job_id)
-        if not job:
+        if not job or job["cancel_event"].is_set():
             return
 
+        cancel_event: asyncio.Event = job["cancel_event"]
         job["status"] = JobStatusEnum.RUNNING
         job["updated_at"] = time.time()
+        self._notify(job)
 
         locations = job["payload"].get("locations", [])[:20]
         results: List[Any] = [None] * len(locations)
 
         try:
             # Process locations concurrently with limited concurrency
-            semaphore = asyncio.Semaphore(self.per_job_concurrency)
+            slots = {"active": 0}
 
             async def process_location(idx: int, loc: dict):
-                if job.get("cancel_requested"):
-                    return None
+                if cancel_event.is_set():
+                    return idx, None
 
-                async with semaphore:
+                async with self._location_slot(slots):
                     try:
-                        return await self._run_single_location(
-                            loc, job["payload"].get("proxy")
+                        res = await self._unless_canceled(
+                            self._run_single_location(loc, job["payload"].get("proxy")),
+                            cancel_event,
                         )
                     except Exception as e:
-                        job["failure"] += 1
-                        error_msg = f"Location analysis failed: {str(e)}"
-                        logger.error(f"Failed location {idx}: {error_msg}")
-                        return {"error": error_msg}
+                        # Already logged, with its traceback, by the analysis
+                        return idx, {"error": f"Location analysis failed: {str(e)}"}
+
+                if res:
+                    res["screenshot_url"] = self._screenshot_url(job, res)
+                return idx, res
 
             # Create tasks for all locations
             tasks = []
             for idx, loc in enumerate(locations):
-                if job.get("cancel_requested"):
-                    break
-                task = asyncio.create_task(process_location(idx, loc))
-                tasks.append((idx, task))
-
-            # Collect results as they complete
-            for idx, task in tasks:
-                if job.get("cancel_requested"):
+                if cancel_event.is_set():
                     break
+                tasks.append(asyncio.create_task(process_location(idx, loc)))
 
+            # Collect results in completion order. Counters are tallied here,
+            # in one place, and published to the job record with each update.
+            completed = failure = 0
+            for next_done in asyncio.as_completed(tasks):
                 try:
-                    res = await task
+                    idx, res = await next_done
                     if res:
-                        # Handle screenshot URL generation
-                        screenshot_path = res.get("screenshot_path") or res.get(
-                            "pinned_screenshot_path"
-                        )
-                        screenshot_url = None
-
-                        if screenshot_path:
-                            try:
-                                rel = os.path.relpath(
-                                    screenshot_path, os.path.abspath("static")
-                                )
-                                screenshot_url = urljoin(
-                                    job["payload"].get("request_base_url", "/"),
-                                    f"static/{rel.replace(os.sep, '/')}",
-                                )
-                            except Exception as e:
-                                logger.warning(
-                                    f"Failed to generate screenshot URL: {e}"
-                                )
-
-                        res["screenshot_url"] = screenshot_url
                         results[idx] = res
-
+                        if "error" in res:
+                            failure += 1
                 except Exception as e:
                     logger.error(f"Task processing failed: {e}")
                 finally:
-                    job["completed"] += 1
+                    completed += 1
+                    job["completed"] = completed
+                    job["failure"] = failure
+                    self._notify(job)
 
-            if not job.get("cancel_requested"):
+                if cancel_event.is_set():
+                    break
+
+            if not cancel_event.is_set():
                 job["result"]["locations"] = [
                     r for r in results if r and "error" not in r
                 ]
                 job["result"]["count"] = len(job["result"]["locations"])
 
                 # Check if all locations failed
-                if len(locations) > 0 and job.get("failure", 0) == len(locations):
+                if len(locations) > 0 and failure == len(locations):
                     error_messages = [
                         r.get("error", "Unknown error")
                         for r in results
@@ -229,6 +350,39 @@ class AsyncJobQueue:
 
         finally:
             job["updated_at"] = time.time()
+            if job_id in self._jobs and job["status"] in TERMINAL_STATUSES:
+                self._finished(job_id)
+            self._notify(job)
+
+    @staticmethod
+    async def _unless_canceled(coro, cancel_event: asyncio.Event):
+        """Await `coro`, abandoning it (returning None) once the job is canceled"""
+        task = asyncio.ensure_future(coro)
+        waiter = asyncio.ensure_future(cancel_event.wait())
+        try:
+            await asyncio.wait({task, waiter}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            waiter.cancel()
+            if not task.done():
+                task.cancel()
+        if not task.done():
+            return None
+        return task.result()
+
+    @staticmethod
+    def _screenshot_url(job: dict, res: dict) -> Optional[str]:
+        """Build the public URL of a location's screenshot"""
+        screenshot_path = res.get("screenshot_path") or res.get(
+            "pinned_screenshot_path"
+        )
+        if not screenshot_path:
+            return None
+
+        try:
+            return _to_static_url(job["static_base_url"], screenshot_path)
+        except Exception as e:
+            logger.warning(f"Failed to generate screenshot URL: {e}")
+            return None
 
     async def _run_single_location(self, loc: dict, proxy: Optional[str] = None):
         """Execute worker for a single location"""
@@ -1,41 +1,32 @@
 #!/usr/bin/python3
 # -*- coding: utf-8 -*-
 
+import asyncio
+import json
 import os
 from datetime import timedelta
 
-import httpx
-from async_worker import job_queue, lifespan
+from async_worker import job_queue, lifespan, selenium_pool
 from auth import authenticate_user, create_access_token, get_current_user
 from config import ACCESS_TOKEN_EXPIRE_MINUTES, RATE, logger
 from db import get_db
-from fastapi import Depends, FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.staticfiles import StaticFiles
-from jobs import JobStatusEnum
-from models import MultiTrafficRequest, Token, TrafficResponse
-from models_db import Job, TrafficLog
-from slowapi import Limiter
-from slowapi.errors import RateLimitExceeded
-from slowapi.middleware import SlowAPIMiddleware
-from slowapi.util import get_remote_address
-from sqlalchemy import select
+from jobs import TERMINAL_STATUSES, JobStatusEnum
+from models import ConcurrencyUpdate, MultiTrafficRequest, Token, TrafficResponse
+from models_db import Job
+from rate_limit import RateLimiter
 from sqlalchemy.ext.asyncio import AsyncSession
-from utils import get_job_record, update_job
+from utils import get_job_record, persist_job, stream_job_locations, update_job
 
 # FastAPI app
-limiter = Limiter(key_func=get_remote_address)
-
 app = FastAPI(title="Google Maps Traffic Analyzer API", lifespan=lifespan)
-app.state.limiter = limiter
-app.add_middleware(SlowAPIMiddleware)
-app.add_exception_handler(
-    RateLimitExceeded,
-    lambda request, exc: JSONResponse(
-        status_code=429, content={"detail": "Too many requests"}
-    ),
-)
+
+# Rate limited routes (job submission)
+rate_limiter = RateLimiter(RATE)
+analyze_router = APIRouter(dependencies=[Depends(rate_limiter)])
 
 # static directory
 os.makedirs("static/images/traffic_screenshots", exist_ok=True)
@@ -74,11 +65,10 @@ async def login(
     return {"access_token": access_token, "token_type": "bearer"}
 
 
-@app.post("/analyze-traffic")
-@app.post("/analyze-batch")
-@app.post("/analyze-locations")
-@app.post("/analyze-points")
-@limiter.limit(RATE)
+@analyze_router.post("/analyze-traffic")
+@analyze_router.post("/analyze-batch")
+@analyze_router.post("/analyze-locations")
+@analyze_router.post("/analyze-points")
 async def analyze_batch(
     request: Request,
     payload: MultiTrafficRequest,
@@ -108,10 +98,11 @@ async def analyze_batch(
         "count": len(payload.locations),
         "proxy": payload.proxy,
         "request_base_url": str(request.base_url),
+        "user_id": user.id,
     }
 
     job_uid = await job_queue.submit(job_payload)
-    status = JobStatusEnum.PENDING.value
+    status = JobStatusEnum.PENDING
 
     try:
         job = Job(uuid=job_uid, status=status, user_id=user.id)
@@ -127,7 +118,14 @@ async def analyze_batch(
     }
 
 
-@app.get("/job/{job_uid}", response_model=TrafficResponse)
+app.include_router(analyze_router)
+
+
+@app.get(
+    "/job/{job_uid}",
+    response_model=None,
+    responses={200: {"model": TrafficResponse}},
+)
 async def get_job(
     job_uid: str | None,
     user=Depends(get_current_user),
@@ -139,33 +137,32 @@ async def get_job(
 
     job = await job_queue.get(job_uid)
     if not job:
-        result = await get_job_record(db, job_uid, user.id)
+        result = await get_job_record(job_uid, user.id)
         if result:
-            return result
+            # Serialized by pydantic-core in one pass, skipping jsonable_encoder
+            return Response(
+                content=result.model_dump_json(), media_type="application/json"
+            )
         raise HTTPException(status_code=404, detail="Job not found")
 
+    # In-memory job data is already well-formed: return it as a plain dict
+    # rather than validating it into TrafficResponse on every poll.
     status = job.get("status")
-    response = TrafficResponse(
-        job_id=job_uid,
-        status=status.value,
-        completed=job.get("completed", 0),
-        locations_count=job.get("payload", {}).get("count", 0),
-        result=job.get("result"),
-        error=job.get("error"),
-    )
+    response = {
+        "job_id": job_uid,
+        "status": status,
+        "completed": job.get("completed", 0),
+        "locations_count": job.get("payload", {}).get("count", 0),
+        "result": job.get("result"),
+        "error": job.get("error"),
+    }
 
     if status in (JobStatusEnum.PENDING, JobStatusEnum.RUNNING):
         return response
 
     if status == JobStatusEnum.FAILED:
         await job_queue.remove(job_uid)
-        await update_job(
-            db,
-            job_uid,
-            user.id,
-            status=response.status,
-            error=response.error,
-        )
+        await persist_job(db, job_uid, job)
 
         raise HTTPException(
             status_code=500,
@@ -175,58 +172,75 @@ async def get_job(
             },
         )
 
-    # DONE: log results to DB
-    if status in (JobStatusEnum.DONE, JobStatusEnum.CANCELED) and job.get("result"):
-        if not job.get("_logged_to_db"):
-            try:
-                result = await db.execute(select(Job).filter(Job.uuid == job_uid))
-                job_record = result.scalar_one_or_none()
-
-                if job_record:
-                    results = job["result"].get("locations", [])
-                    payload_locations = job["payload"].get("locations", [])
-
-                    for i, res in enumerate(results):
-                        if i < len(payload_locations):
-                            log = TrafficLog(
-                                lat=payload_locations[i].get("lat"),
-                                lng=payload_locations[i].get("lng"),
-                                score=res.get("score"),
-                                method=res.get("method"),
-                                screenshot_url=res.get("screenshot_url"),
-                                details=res,
-                                job_id=job_record.id,
-                            )
-                            db.add(log)
-
-                    await db.commit()
-                    job["_logged_to_db"] = True
-            except Exception as e:
-                logger.warning(f"DB log failed for job {job_uid}: {e}")
-
+    # DONE / CANCELED: log results to DB
+    await persist_job(db, job_uid, job)
     await job_queue.remove(job_uid)
-    await update_job(
-        db,
-        job_uid,
-        user.id,
-        status=response.status,
-        error=response.error,
-    )
 
     return response
 
 
+@app.get("/job/{job_uid}/stream")
+async def stream_job(job_uid: str, user=Depends(get_current_user)):
+    """
+    Server-sent events with the job progress, one event per change.
+    The stream ends once the job is finished; fetch /job/{job_uid} for results.
+    """
+    job = await job_queue.get(job_uid)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        last = None
+        while True:
+            version = job["version"]
+            snapshot = {
+                "job_id": job_uid,
+                "status": job["status"],
+                "completed": job["completed"],
+                "locations_count": job["payload"].get("count", 0),
+                "error": job["error"],
+            }
+            if snapshot != last:
+                yield f"data: {json.dumps(snapshot)}\n\n"
+                last = snapshot
+            # The job may have moved on while we were suspended at yield: end on
+            # the status that was sent, and don't wait if there is news already
+            if snapshot["status"] in TERMINAL_STATUSES:
+                break
+
+            try:
+                await asyncio.wait_for(
+                    job_queue.wait_for_progress(job, version), timeout=15
+                )
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.get("/job/{job_uid}/locations")
+async def get_job_locations(job_uid: str, user=Depends(get_current_user)):
+    """
+    Stored locations of a collected job as NDJSON, one location per line.
+    Rows are streamed as they are read, so large jobs are never held in memory.
+    """
+    if not await get_job_record(job_uid, user.id, include_locations=False):
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return StreamingResponse(
+        stream_job_locations(job_uid, user.id), media_type="application/x-ndjson"
+    )
+
+
 @app.post("/job/{job_uid}/cancel", response_model=TrafficResponse)
-async def cancel_job(
-    job_uid: str, user=Depends(get_current_user), db: AsyncSession = Depends(get_db)
-):
+async def cancel_job(job_uid: str, user=Depends(get_current_user)):
     job = await job_queue.cancel(job_uid)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
 
     response = TrafficResponse(
         job_id=job_uid,
-        status=job.get("status").value,
+        status=job.get("status"),
         completed=job.get("completed", 0),
         locations_count=job.get("payload", {}).get("count", 0),
         result=job.get("result"),
@@ -234,7 +248,6 @@ async def cancel_job(
     )
 
     await update_job(
-        db,
         job_uid,
         user.id,
         status=response.status,
@@ -244,8 +257,21 @@ async def cancel_job(
     return response
 
 
+@app.post("/admin/concurrency")
+async def set_concurrency(payload: ConcurrencyUpdate, user=Depends(get_current_user)):
+    """
+    Retune how many locations of a job are analyzed at once, without a restart.
+    Running jobs pick up the new limit as their current locations finish.
+    """
+    if user.username != "admin":
+        raise HTTPException(status_code=403, detail="Admin only")
+
+    await job_queue.set_concurrency(payload.per_job_concurrency)
+    return {"per_job_concurrency": job_queue.per_job_concurrency}
+
+
 @app.get("/health")
-async def health_check():
+async def health_check(request: Request):
     """
     Health check endpoint to verify Selenium Grid status
     """
@@ -255,15 +281,14 @@ async def health_check():
 
     # Check Selenium Grid status
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get("http://selenium-hub:4444/status")
-            if response.status_code == 200:
-                data = response.json()
-                grid_ready = data.get("value", {}).get("ready", False)
-                available_nodes = len(data.get("value", {}).get("nodes", []))
-                selenium_status = "healthy" if grid_ready else "degraded"
-            else:
-                selenium_status = f"unhealthy: HTTP {response.status_code}"
+        response = await request.app.state.http.get("http://selenium-hub:4444/status")
+        if response.status_code == 200:
+            data = response.json()
+            grid_ready = data.get("value", {}).get("ready", False)
+            available_nodes = len(data.get("value", {}).get("nodes", []))
+            selenium_status = "healthy" if grid_ready else "degraded"
+        else:
+            selenium_status = f"unhealthy: HTTP {response.status_code}"
     except Exception as e:
         selenium_status = f"unhealthy: {str(e)}"
 
@@ -274,5 +299,6 @@ async def health_check():
             "ready": grid_ready,
             "nodes": available_nodes,
             "max_sessions": available_nodes * 4,
+            "discarded_sessions": selenium_pool.discarded,
         },
     }
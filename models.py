@@ -3,15 +3,19 @@
 
 from typing import Any, Dict, List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class Token(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
     access_token: str
     token_type: str
 
 
 class TrafficResponse(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
     job_id: str
     status: str
     completed: int
@@ -21,6 +25,8 @@ class TrafficResponse(BaseModel):
 
 
 class LocationItem(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
     lat: float
     lng: float
     storefront_direction: Optional[str] = "north"
@@ -29,5 +35,13 @@ class LocationItem(BaseModel):
 
 
 class MultiTrafficRequest(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
     locations: List[LocationItem]
     proxy: Optional[str] = None
+
+
+class ConcurrencyUpdate(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    per_job_concurrency: int = Field(ge=1)
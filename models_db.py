@@ -1,60 +1,71 @@
 #!/usr/bin/python3
 # -*- coding: utf-8 -*-
 
+from datetime import datetime
+from typing import Any, List, Optional
+
 from db import Base
 from jobs import JobStatusEnum
-from sqlalchemy import JSON, Column, DateTime, Float, ForeignKey, Integer, String
-from sqlalchemy.orm import relationship
+from sqlalchemy import JSON, DateTime, Float, ForeignKey, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 
 
 class User(Base):
     __tablename__ = "users"
 
-    id = Column(Integer, primary_key=True, index=True)
-    username = Column(String, unique=True, index=True, nullable=False)
-    hashed_password = Column(String, nullable=False)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    username: Mapped[str] = mapped_column(String, unique=True, index=True)
+    hashed_password: Mapped[str] = mapped_column(String)
 
-    jobs = relationship("Job", back_populates="user", cascade="all, delete-orphan")
+    jobs: Mapped[List["Job"]] = relationship(
+        back_populates="user", cascade="all, delete-orphan"
+    )
 
 
 class TrafficLog(Base):
     __tablename__ = "traffic_logs"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
 
-    lat = Column(Float, nullable=False)
-    lng = Column(Float, nullable=False)
-    score = Column(Float, nullable=True)
-    method = Column(String, nullable=True)
-    screenshot_url = Column(String, nullable=True)
-    details = Column(JSON, nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    lat: Mapped[float] = mapped_column(Float)
+    lng: Mapped[float] = mapped_column(Float)
+    score: Mapped[Optional[float]] = mapped_column(Float)
+    method: Mapped[Optional[str]] = mapped_column(String)
+    screenshot_url: Mapped[Optional[str]] = mapped_column(String)
+    details: Mapped[Optional[Any]] = mapped_column(JSON)
+    created_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
 
-    job_id = Column(Integer, ForeignKey("jobs.id", ondelete="CASCADE"), nullable=False)
+    job_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("jobs.id", ondelete="CASCADE"), index=True
+    )
 
-    job = relationship("Job", back_populates="traffic_logs")
+    job: Mapped["Job"] = relationship(back_populates="traffic_logs")
 
 
 class Job(Base):
     __tablename__ = "jobs"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
 
-    uuid = Column(String, unique=True, index=True, nullable=False)
-    status = Column(String, nullable=False)
+    uuid: Mapped[str] = mapped_column(String, unique=True, index=True)
+    status: Mapped[str] = mapped_column(String)
     # completed = Column(Integer, nullable=False, server_default="0")
-    error = Column(String, nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    error: Mapped[Optional[str]] = mapped_column(String)
+    created_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
 
-    user_id = Column(
-        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    user_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE")
     )
 
-    user = relationship("User", back_populates="jobs")
+    user: Mapped["User"] = relationship(back_populates="jobs")
 
-    traffic_logs = relationship(
-        "TrafficLog", back_populates="job", cascade="all, delete-orphan"
+    traffic_logs: Mapped[List["TrafficLog"]] = relationship(
+        back_populates="job", cascade="all, delete-orphan"
     )
 
     def set_status(self, status: JobStatusEnum):
@@ -0,0 +1,41 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import time
+from typing import Dict, Tuple
+
+from fastapi import HTTPException, Request
+
+WINDOWS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+def parse_rate(rate: str) -> Tuple[int, int]:
+    """Parse a limit like '10/minute' into (requests, window seconds)"""
+    count, _, period = rate.partition("/")
+    return int(count), WINDOWS[period.strip().lower().rstrip("s")]
+
+
+class RateLimiter:
+    """
+    Fixed-window request counter keyed on client IP, used as a route dependency.
+    Counters live in-process, which matches the single-process deployment.
+    """
+
+    def __init__(self, rate: str):
+        self.limit, self.window = parse_rate(rate)
+        self._counters: Dict[Tuple[str, int], int] = {}
+        self._bucket = 0
+
+    async def __call__(self, request: Request) -> None:
+        bucket = int(time.monotonic() // self.window)
+        if bucket != self._bucket:
+            # New window: counters from older windows can never match again
+            self._counters = {k: v for k, v in self._counters.items() if k[1] >= bucket}
+            self._bucket = bucket
+
+        key = (request.client.host if request.client else "unknown", bucket)
+        count = self._counters.get(key, 0) + 1
+        self._counters[key] = count
+
+        if count > self.limit:
+            raise HTTPException(status_code=429, detail="Too many requests")
@@ -3,21 +3,29 @@ Standalone Google Maps Traffic Analysis Module
 Provides traffic analysis using Google Maps screenshots and color detection
 """
 
+import atexit
+import base64
+import functools
+import io
 import logging
 import math
 import os
+import queue
 import re
-import shutil
+import threading
 import time
-from collections import Counter
-from typing import Any, Dict, Optional, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
 import numpy as np
 from PIL import Image
 from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
 from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.remote_connection import ChromeRemoteConnection
 from selenium.webdriver.common.action_chains import ActionChains
 from selenium.webdriver.common.by import By
+from selenium.webdriver.remote.client_config import ClientConfig
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 
@@ -38,6 +46,20 @@ TRAFFIC_COLORS = {
 
 TRAFFIC_SCORES = {"dark_red": 100, "red": 100, "yellow": 70, "green": 30, "gray": 0}
 
+# Label ids used by build_label_map, in TRAFFIC_COLORS order
+TRAFFIC_LABELS = list(TRAFFIC_COLORS)
+GRAY_ID = TRAFFIC_LABELS.index("gray")
+SCORES_VEC = np.array([TRAFFIC_SCORES[c] for c in TRAFFIC_LABELS], np.int32)
+# Per-label RGB bounds, shape (len(TRAFFIC_LABELS), 3)
+COLOR_LO = np.array([TRAFFIC_COLORS[c][0] for c in TRAFFIC_LABELS], np.uint8)
+COLOR_HI = np.array([TRAFFIC_COLORS[c][1] for c in TRAFFIC_LABELS], np.uint8)
+
+# TRAFFIC_COLORS flattened to (name, r_min, r_max, g_min, g_max, b_min, b_max)
+_COLOR_BOUNDS = [
+    (color, lo[0], hi[0], lo[1], hi[1], lo[2], hi[2])
+    for color, (lo, hi) in TRAFFIC_COLORS.items()
+]
+
 
 # Direction mappings for storefront orientation
 DIRECTION_ANGLES = {
@@ -59,6 +81,12 @@ DIRECTION_ANGLES = {
     "nw": 315,
 }
 
+
+def direction_to_angle(direction: str) -> int:
+    """Compass angle of a storefront direction; unknown directions face north"""
+    return DIRECTION_ANGLES.get(direction.lower(), 0)
+
+
 DAY_MAP = {
     "sunday": 0,
     "monday": 1,
@@ -71,6 +99,87 @@ DAY_MAP = {
 
 TIME_MAP = {"8:30AM": 28, "6PM": 135, "10PM": 180}
 
+# Accepted target_time values ("6PM", "8:30AM", "6:00PM") and the ":00" to drop
+_TIME_RE = re.compile(r"(1[0-2]|[1-9])(?::[0-5]\d)?[AP]M")
+_ZERO_RE = re.compile(r":00(?=[AP]M)")
+
+# Screenshots are clipped to the outer 150m ring around the map center
+# (1.5 px/m at zoom 18, see analyze_traffic_in_image)
+CAPTURE_RADIUS_PX = 225
+
+# Imagery that never reaches the analyzed area (place photos, Street View)
+BLOCKED_URLS = [
+    "*lh3.googleusercontent.com/*",
+    "*gstatic.com/maps/api/js/photo*",
+    "*streetview*",
+]
+
+# Scratch buffers of the image analysis, per thread (analyses run in parallel)
+_SCRATCH = threading.local()
+
+# Map overlays removed before the screenshot, in one script (one round-trip).
+# Returns how many of them were found.
+REMOVE_CLUTTER_JS = """
+const found = [
+    document.getElementById("assistive-chips"),
+    document.getElementById("omnibox-container"),
+    document.getElementById("vasquette"),
+    document.evaluate(
+        "/html/body/div[1]/div[3]/div[9]/div[7]/div/div", document, null,
+        XPathResult.FIRST_ORDERED_NODE_TYPE, null
+    ).singleNodeValue,
+].filter(Boolean);
+found.forEach((element) => element.remove());
+return found.length;
+"""
+
+# Keep-alive connections to the Selenium Grid shared by all sessions
+GRID_HTTP_POOL_SIZE = 64
+
+
+class GridConnection(ChromeRemoteConnection):
+    """
+    Chrome remote connection that takes its HTTP connections from one urllib3
+    pool shared by every session, instead of opening a new pool (and new TCP
+    connections to the hub) per session.
+    """
+
+    _shared_manager = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, selenium_url: str):
+        super().__init__(
+            selenium_url,
+            client_config=ClientConfig(
+                remote_server_addr=selenium_url,
+                keep_alive=True,
+                timeout=120,
+                # RemoteConnection reads the pool arguments from this nested key
+                init_args_for_pool_manager={
+                    "init_args_for_pool_manager": {
+                        "maxsize": GRID_HTTP_POOL_SIZE,
+                        "block": False,
+                    }
+                },
+            ),
+        )
+
+    def _get_connection_manager(self):
+        with GridConnection._shared_lock:
+            if GridConnection._shared_manager is None:
+                GridConnection._shared_manager = super()._get_connection_manager()
+            return GridConnection._shared_manager
+
+    def close(self):
+        # The shared pool outlives any single session
+        pass
+
+
+def execute_cdp(driver: webdriver.Remote, cmd: str, params: Optional[dict] = None):
+    """Run a Chrome DevTools command (webdriver.Remote lacks execute_cdp_cmd)"""
+    response = driver.execute("executeCdpCommand", {"cmd": cmd, "params": params or {}})
+    return response["value"]
+
 
 def setup_webdriver(
     selenium_url: Optional[str], proxy: Optional[str]
@@ -94,11 +203,9 @@ def setup_webdriver(
     chrome_options.add_argument("--disable-extensions")
     chrome_options.add_argument("--disable-infobars")
     chrome_options.add_argument("--disable-browser-side-navigation")
-    chrome_options.add_argument("--aggressive-cache-discard")
-    chrome_options.add_argument("--disable-application-cache")
     chrome_options.add_argument("--media-cache-size=1")
-    chrome_options.add_argument("--disk-cache-size=1")
     chrome_options.add_argument("--disable-plugins")
+    chrome_options.add_argument("--force-prefers-reduced-motion")
     # chrome_options.add_argument("--disable-images")  # Critical for speed
     # chrome_options.add_argument("--disable-javascript")  # Maximum speed
     # chrome_options.add_argument("--blink-settings=imagesEnabled=false")
@@ -121,11 +228,16 @@ def setup_webdriver(
 
     try:
         driver = webdriver.Remote(
-            command_executor=selenium_url,
+            command_executor=GridConnection(selenium_url),
             options=chrome_options,
         )
         driver.set_page_load_timeout(30)
         driver.implicitly_wait(10)
+        try:
+            execute_cdp(driver, "Network.enable")
+            execute_cdp(driver, "Network.setBlockedURLs", {"urls": BLOCKED_URLS})
+        except Exception as e:
+            logger.warning(f"Could not block image requests: {e}")
         logger.info(f"Successfully connected to Selenium Grid at {selenium_url}")
         return driver
     except Exception as e:
@@ -134,6 +246,41 @@ def setup_webdriver(
         raise Exception(error_msg) from e
 
 
+def reset_webdriver(driver) -> bool:
+    """
+    Blank a session for reuse (page and cookies). False if the session is
+    gone or unresponsive and should be quit instead.
+    """
+    if driver is None or driver.session_id is None:
+        return False
+    try:
+        driver.get("about:blank")
+        execute_cdp(driver, "Network.clearBrowserCookies")
+        return True
+    except Exception as e:
+        logger.warning(f"Could not reset webdriver, closing it: {e}")
+        return False
+
+
+def is_webdriver_alive(driver) -> bool:
+    """Cheap round trip to the Grid: False once the session is gone"""
+    if driver is None or driver.session_id is None:
+        return False
+    try:
+        return driver.execute_script("return 1") == 1
+    except Exception:
+        return False
+
+
+def is_webdriver_error(error: Optional[BaseException]) -> bool:
+    """True if `error`, or an error it was raised from, came from the WebDriver"""
+    while error is not None:
+        if isinstance(error, WebDriverException):
+            return True
+        error = error.__cause__
+    return False
+
+
 def cleanup_webdriver(driver):
     """Safely cleanup webdriver"""
     if driver:
@@ -145,6 +292,116 @@ def cleanup_webdriver(driver):
             logger.error(f"Error closing webdriver: {e}")
 
 
+class DriverPool:
+    """
+    Warm Selenium sessions kept open between locations, keyed by
+    (selenium_url, proxy). At most `size` sessions are open; a session that
+    errors, or that the Grid dropped while idle, is quit instead of reused. Thread-safe; async callers use
+    async_worker.SeleniumSessionPool, which wraps this pool.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.discarded = 0  # sessions quit as broken, for monitoring
+
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._idle: Dict[Tuple[Optional[str], Optional[str]], queue.Queue] = {}
+        self._keys: Dict[webdriver.Remote, Tuple[Optional[str], Optional[str]]] = {}
+        self._open = 0  # idle + checked out + starting sessions
+
+    def _evict_idle(self) -> Optional[webdriver.Remote]:
+        """Pop an idle session held for any key to free a slot"""
+        for idle in self._idle.values():
+            try:
+                driver = idle.get_nowait()
+            except queue.Empty:
+                continue
+            del self._keys[driver]
+            self._open -= 1
+            return driver
+        return None
+
+    def _take_idle(self, key) -> Optional[webdriver.Remote]:
+        """Pop an idle session held for `key`, if any"""
+        with self._lock:
+            try:
+                return self._idle.setdefault(key, queue.Queue()).get_nowait()
+            except queue.Empty:
+                return None
+
+    def _forget(self, driver: webdriver.Remote) -> None:
+        """Stop tracking a broken session; the caller quits it"""
+        with self._lock:
+            self._keys.pop(driver, None)
+            self._open -= 1
+            self.discarded += 1
+
+    def acquire(
+        self, selenium_url: Optional[str], proxy: Optional[str]
+    ) -> webdriver.Remote:
+        """Borrow a session, starting a new one if none is idle"""
+        self._slots.acquire()
+        key = (selenium_url, proxy)
+        try:
+            # The Grid drops sessions left idle past its timeout: check first
+            while (driver := self._take_idle(key)) is not None:
+                if is_webdriver_alive(driver):
+                    return driver
+                logger.warning("Idle Selenium session expired, replacing it")
+                self._forget(driver)
+                cleanup_webdriver(driver)
+
+            with self._lock:
+                # Pool is full of idle sessions for other keys: recycle one
+                stale = self._evict_idle() if self._open >= self.size else None
+                self._open += 1
+
+            try:
+                if stale is not None:
+                    cleanup_webdriver(stale)
+                driver = setup_webdriver(selenium_url, proxy)
+            except BaseException:
+                with self._lock:
+                    self._open -= 1
+                raise
+            with self._lock:
+                self._keys[driver] = key
+            return driver
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, driver: webdriver.Remote) -> None:
+        """Reset a session and keep it for the next call"""
+        if not reset_webdriver(driver):
+            self.discard(driver)
+            return
+
+        with self._lock:
+            self._idle[self._keys[driver]].put(driver)
+        self._slots.release()
+
+    def discard(self, driver: webdriver.Remote) -> None:
+        """Quit a session that should not be reused"""
+        self._forget(driver)
+        self._slots.release()
+        cleanup_webdriver(driver)
+
+    def close(self) -> None:
+        """Quit every idle session"""
+        drivers = []
+        with self._lock:
+            while (driver := self._evict_idle()) is not None:
+                drivers.append(driver)
+        for driver in drivers:
+            cleanup_webdriver(driver)
+
+
+_driver_pool = DriverPool(int(os.getenv("TRAFFIC_DRIVER_POOL", 4)))
+atexit.register(_driver_pool.close)
+
+
 def get_google_maps_url(lat: float, lng: float, zoom: int = 18) -> str:
     """Generate Google Maps URL with traffic layer enabled at 20m zoom level with North up"""
     # Enable traffic layer by adding traffic parameter
@@ -156,18 +413,39 @@ def get_google_maps_url(lat: float, lng: float, zoom: int = 18) -> str:
     return f"{base_url}/{params}?hl=en&gl=us"
 
 
-def retry_exception(callback, name: str, retry_count: int = 3):
-    success = False
-    for attempt in range(retry_count):  # Try up to {N} times
+def retry_exception(callback, name: str, retry_count: int = 3, backoff: float = 0.2):
+    """
+    Call `callback` up to `retry_count` times, sleeping backoff * 2**attempt
+    between attempts. Returns its result, or re-raises the last error.
+    """
+    for attempt in range(retry_count):
         try:
-            callback()
-            success = True
-            break
+            return callback()
         except Exception as error:
             logger.warning(f"{name} attempt {attempt + 1} failed: {error}")
-            if attempt < 2:  # Don't sleep on the last attempt
-                time.sleep(1)
-    return success
+            if attempt == retry_count - 1:
+                raise
+            time.sleep(backoff * 2**attempt)
+
+
+def _wait_for_network_idle(driver, timeout: float = 3, quiet: float = 0.5):
+    """
+    Wait until the page has fetched nothing new (map tiles etc.) for `quiet`
+    seconds, giving up after `timeout` seconds
+    """
+    driver.execute_script("performance.clearResourceTimings();")
+    deadline = time.monotonic() + timeout
+    seen, quiet_since = 0, time.monotonic()
+    while time.monotonic() < deadline:
+        count = driver.execute_script(
+            "return performance.getEntriesByType('resource').length;"
+        )
+        if count != seen:
+            seen, quiet_since = count, time.monotonic()
+        elif time.monotonic() - quiet_since >= quiet:
+            return True
+        time.sleep(0.1)
+    return False
 
 
 def _select_typical_mode(driver):
@@ -227,8 +505,8 @@ def _select_typical_mode_day(driver, day_of_week):
 def _select_typical_mode_time(driver, target_time):
     try:
         target_time = target_time.strip().upper()
-        if re.fullmatch(r"(1[0-2]|[1-9])(?::[0-5]\d)?[AP]M", target_time):
-            clean_time = re.sub(r":00(?=[AP]M)", "", target_time)
+        if _TIME_RE.fullmatch(target_time):
+            clean_time = _ZERO_RE.sub("", target_time)
             pos = TIME_MAP.get(clean_time, 0)
 
             actions = ActionChains(driver)
@@ -254,13 +532,71 @@ def _select_typical_mode_time(driver, target_time):
         logger.info("Failed to adjust the traffic time slider.")
 
 
+def _capture_map_center(driver) -> bytes:
+    """
+    PNG of the square around the viewport center that the analysis uses.
+    The clip is centered, so the image center is still the map center.
+    """
+    try:
+        width, height = driver.execute_script(
+            "return [window.innerWidth, window.innerHeight];"
+        )
+        r = min(CAPTURE_RADIUS_PX, width // 2, height // 2)
+        clip = {
+            "x": width // 2 - r,
+            "y": height // 2 - r,
+            "width": 2 * r + 1,
+            "height": 2 * r + 1,
+            "scale": 1,
+        }
+        # The PNG is decoded straight away, so favour encoding speed over size
+        params = {"format": "png", "clip": clip, "optimizeForSpeed": True}
+        data = execute_cdp(driver, "Page.captureScreenshot", params)["data"]
+    except Exception as e:
+        logger.warning(f"Clipped screenshot failed, capturing full viewport: {e}")
+        return driver.get_screenshot_as_png()
+
+    return base64.b64decode(data)
+
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+STATIC_SCREENSHOTS_DIR = os.path.join(
+    BASE_DIR, "static", "images", "traffic_screenshots"
+)
+LOCAL_SCREENSHOTS_DIR = os.path.join(BASE_DIR, "traffic_screenshots")
+
+
+@functools.lru_cache(maxsize=None)
+def screenshots_dir(save_to_static: bool) -> str:
+    """Directory pinned screenshots are written to, created on first use"""
+    path = STATIC_SCREENSHOTS_DIR if save_to_static else LOCAL_SCREENSHOTS_DIR
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def screenshot_filename(
+    lat: float,
+    lng: float,
+    day_of_week: Optional[Union[str, int]] = None,
+    target_time: Optional[str] = None,
+) -> str:
+    """File name of a location's pinned screenshot"""
+    safe_day_of_week = (
+        str(day_of_week).replace(" ", "_") if day_of_week is not None else "no_day"
+    )
+    safe_target_time = (
+        str(target_time).replace(":", "-") if target_time is not None else "no_time"
+    )
+    return f"traffic_{lat}_{lng}_{safe_day_of_week}_{safe_target_time}_pinned.png"
+
+
 def capture_google_maps_screenshot(
     driver,
     lat: float,
     lng: float,
     day_of_week: Optional[Union[str, int]] = None,
     target_time: Optional[str] = None,
-) -> Tuple[Optional[str], bool]:
+) -> Tuple[Optional[Image.Image], bool]:
     """Capture screenshot of Google Maps with traffic at specified location"""
 
     live_traffic = True  # Default to live traffic unless typical traffic is selected
@@ -273,8 +609,15 @@ def capture_google_maps_screenshot(
         # Load Google Maps
         driver.get(maps_url)
 
-        # Wait for the page to load
-        time.sleep(5)
+        # Wait for the map canvas instead of a fixed delay
+        try:
+            WebDriverWait(driver, 10).until(
+                EC.presence_of_element_located(
+                    (By.CSS_SELECTOR, "#scene canvas, canvas.widget-scene-canvas")
+                )
+            )
+        except Exception:
+            logger.info("Map canvas not detected, continuing")
 
         # Try to accept cookies if present
         try:
@@ -288,7 +631,7 @@ def capture_google_maps_screenshot(
             )
             accept_button.click()
             logger.info("Cookie banner accepted")
-            time.sleep(2)
+            WebDriverWait(driver, 5).until(EC.invisibility_of_element(accept_button))
         except Exception:
             logger.info("No cookie banner found")
 
@@ -297,17 +640,17 @@ def capture_google_maps_screenshot(
             driver.execute_script(
                 "window.dispatchEvent(new WheelEvent('wheel', {deltaY: -100, bubbles: true}));"
             )
-            time.sleep(2)
+            _wait_for_network_idle(driver)
 
             driver.execute_script(
                 "window.dispatchEvent(new WheelEvent('wheel', {deltaY: 100, bubbles: true}));"
             )
-            time.sleep(1)
+            _wait_for_network_idle(driver)
 
             driver.execute_script(
                 "window.dispatchEvent(new WheelEvent('wheel', {deltaY: 100, bubbles: true}));"
             )
-            time.sleep(2)
+            _wait_for_network_idle(driver)
         except Exception as zoom_error:
             logger.warning(f"Zoom operations failed: {zoom_error}")
 
@@ -330,109 +673,128 @@ def capture_google_maps_screenshot(
 
         # Cleaning up unimportant elements
         try:
-            elements_to_remove = (
-                (By.ID, "assistive-chips"),
-                (By.ID, "omnibox-container"),
-                (By.ID, "vasquette"),
-                (By.XPATH, "/html/body/div[1]/div[3]/div[9]/div[7]/div/div"),
-            )
-
-            for by, value in elements_to_remove:
-                try:
-                    # element = WebDriverWait(driver, 5).until(
-                    #     EC.presence_of_element_located(
-                    #         (
-                    #             by,
-                    #             value,
-                    #         )
-                    #     )
-                    # )
-                    driver.execute_script("arguments[0].remove();", driver.find_element(by, value))
-                except Exception:
-                    pass
-
-            logger.info("Successfully Cleaning up unimportant elements")
-            time.sleep(1)
+            removed = driver.execute_script(REMOVE_CLUTTER_JS)
+            logger.info(f"Successfully Cleaning up unimportant elements ({removed})")
         except Exception as cleanup_error:
             logger.warning(
                 f"Failed to cleaning up unimportant elements: {cleanup_error}"
             )
 
-        # Generate screenshot path
-        # Save screenshots in local traffic_screenshots folder
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        screenshots_dir = os.path.join(current_dir, "traffic_screenshots")
-        os.makedirs(screenshots_dir, exist_ok=True)
-
-        safe_day_of_week = (
-            str(day_of_week).replace(" ", "_") if day_of_week is not None else "no_day"
-        )
-        safe_target_time = (
-            str(target_time).replace(":", "-") if target_time is not None else "no_time"
-        )
-
-        screenshot_filename = (
-            f"traffic_{lat}_{lng}_{safe_day_of_week}_{safe_target_time}.png"
-        )
-        screenshot_path = os.path.join(screenshots_dir, screenshot_filename)
-
-        # Take screenshot with retry logic
-        screenshot_success = retry_exception(
-            lambda: driver.save_screenshot(screenshot_path), "Screenshot"
-        )
-        if not screenshot_success:
-            raise Exception("Failed to capture screenshot after 3 attempts")
+        # Take screenshot with retry logic; decoded in memory, never written here
+        png = retry_exception(lambda: _capture_map_center(driver), "Screenshot")
 
-        logger.info(f"Screenshot captured at 20m zoom level: {screenshot_path}")
-        return screenshot_path, live_traffic
+        image = Image.open(io.BytesIO(png))
+        image.load()
+        logger.info(f"Screenshot captured at 20m zoom level: {image.size}")
+        return image, live_traffic
 
+    except WebDriverException:
+        # The session itself failed: let the caller discard it
+        raise
     except Exception as e:
         logger.error(f"Failed to capture Google Maps screenshot: {e}")
         return None, live_traffic
 
 
-def classify_traffic_color(rgb: Tuple[int, int, int]) -> str:
-    """Classify RGB color into traffic categories"""
-    for traffic_type, (min_rgb, max_rgb) in TRAFFIC_COLORS.items():
+def classify_traffic_color(r: int, g: int, b: int) -> str:
+    """Classify one RGB color into traffic categories (images: build_label_map)"""
+    for traffic_type, r0, r1, g0, g1, b0, b1 in _COLOR_BOUNDS:
         # Check if color is within range
-        if all(
-            min_val <= rgb[i] <= max_val
-            for i, (min_val, max_val) in enumerate(zip(min_rgb, max_rgb))
-        ):
+        if r0 <= r <= r1 and g0 <= g <= g1 and b0 <= b <= b1:
             return traffic_type
     return "gray"  # Default to gray if no range matches
 
 
-def add_pin_to_image(image_path: str, storefront_direction: str = "north") -> str:
-    """Add a pin marker and directional cone to the center of the image for verification"""
-    try:
+def _scratch(name: str, shape: Tuple[int, ...], dtype) -> np.ndarray:
+    """Per-thread array reused across calls while the shape stays the same"""
+    buf = getattr(_SCRATCH, name, None)
+    if buf is None or buf.shape != shape or buf.dtype != dtype:
+        buf = np.empty(shape, dtype)
+        setattr(_SCRATCH, name, buf)
+    return buf
 
-        # Add a small delay to ensure the file is not locked
-        time.sleep(0.2)
 
-        # Load the image
-        image = Image.open(image_path)
+def build_label_map(
+    image_array: np.ndarray, out: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Classify every pixel at once: returns an HxW int8 array of TRAFFIC_LABELS ids.
+    Matches classify_traffic_color, including its first-match-wins order.
+    Fills `out` (HxW int8) instead of allocating when given.
+    """
+    shape = image_array.shape[:2]
+    labels = np.empty(shape, np.int8) if out is None else out
+    labels.fill(GRAY_ID)
+
+    mask = _scratch("mask", shape, bool)
+    tmp = _scratch("tmp", shape, bool)
+    # Paint in reverse so earlier ranges overwrite later ones where they overlap
+    for label_id in reversed(range(len(TRAFFIC_LABELS))):
+        lo, hi = COLOR_LO[label_id], COLOR_HI[label_id]
+        mask.fill(True)
+        for channel in range(3):
+            values = image_array[..., channel]
+            mask &= np.greater_equal(values, lo[channel], out=tmp)
+            mask &= np.less_equal(values, hi[channel], out=tmp)
+        labels[mask] = label_id
+    return labels
+
+
+@functools.lru_cache(maxsize=8)
+def _radial_zones(
+    height: int, width: int, center_x: int, center_y: int, radii_sq: Tuple[int, ...]
+) -> np.ndarray:
+    """
+    Zone id of every pixel: i for the i-th ring of radii_sq (squared outer radii,
+    ascending), len(radii_sq) outside them all. Cached: screenshots share a size.
+    """
+    yy, xx = np.ogrid[:height, :width]
+    d2 = (xx - center_x) ** 2 + (yy - center_y) ** 2
+    zones = np.searchsorted(radii_sq, d2).astype(np.int8)
+    zones.flags.writeable = False
+    return zones
 
-        # Get image center
-        width, height = image.size
-        center_x, center_y = width // 2, height // 2
 
-        # Add directional cone for storefront direction
-        _add_directional_arrow(image, center_x, center_y, storefront_direction)
+def zone_color_counts(labels: np.ndarray, zones: np.ndarray, n_zones: int):
+    """
+    Color histogram of every zone in one bincount: returns an array of shape
+    (n_zones, len(TRAFFIC_LABELS)). Pixels with a zone id >= n_zones are skipped.
+    """
+    n_labels = len(TRAFFIC_LABELS)
+    flat = zones.astype(np.intp) * n_labels + labels
+    counts = np.bincount(flat.ravel(), minlength=(n_zones + 1) * n_labels)
+    return counts.reshape(-1, n_labels)[:n_zones]
+
+
+def score_counts(counts: np.ndarray) -> Tuple[float, int, Dict[str, int]]:
+    """Score a zone from its color histogram: (score, pixels, color counts)"""
+    non_gray = int(counts.sum() - counts[GRAY_ID])
+    # Gray scores 0, so it drops out of the dot product
+    zone_score = int(counts @ SCORES_VEC) / non_gray if non_gray else 0
+    colors = {
+        color: int(count) for color, count in zip(TRAFFIC_LABELS, counts) if count
+    }
+    return zone_score, int(counts.sum()), colors
 
-        # Generate pinned image path
-        pinned_path = image_path.replace(".png", "_pinned.png")
 
-        # Ensure we close the original image before saving
-        image_copy = image.copy()
-        image.close()
+def draw_pin(image: Image.Image, storefront_direction: str = "north") -> Image.Image:
+    """Draw the pin marker and directional cone at the image center, in place"""
+    width, height = image.size
+    _add_directional_arrow(image, width // 2, height // 2, storefront_direction)
+    return image
+
 
-        # Save the modified image
-        image_copy.save(pinned_path)
-        image_copy.close()
+def add_pin_to_image(image_path: str, storefront_direction: str = "north") -> str:
+    """Add a pin marker and directional cone to the center of the image for verification"""
+    try:
+        # Generate pinned image path
+        pinned_path = image_path.replace(".png", "_pinned.png")
 
-        # Add a small delay to ensure the file is fully written
-        time.sleep(0.5)
+        # Load, draw the directional cone and save (save is synchronous)
+        with Image.open(image_path) as image:
+            image.load()
+            draw_pin(image, storefront_direction)
+            image.save(pinned_path, compress_level=1)
 
         logger.info(f"Pin and directional cone added to image: {pinned_path}")
         return pinned_path
@@ -442,6 +804,25 @@ def add_pin_to_image(image_path: str, storefront_direction: str = "north") -> st
         return image_path  # Return original path if pin addition fails
 
 
+@functools.lru_cache(maxsize=None)
+def _cone_base_offsets(direction_angle: int):
+    """Offsets of the pin cone's two base corners from its tip, per direction"""
+    cone_length = 52  # 75% larger cone
+    cone_width_degrees = 25  # Half-width of the cone's base in degrees
+
+    corners = []
+    for angle in (
+        direction_angle - cone_width_degrees,
+        direction_angle + cone_width_degrees,
+    ):
+        angle_rad = math.radians(angle)
+        # Y is inverted in image coordinates
+        corners.append(
+            (cone_length * math.sin(angle_rad), -cone_length * math.cos(angle_rad))
+        )
+    return tuple(corners)
+
+
 def _add_directional_arrow(
     image: Image.Image, center_x: int, center_y: int, direction: str
 ):
@@ -464,110 +845,51 @@ def _add_directional_arrow(
         width=1,
     )
 
-    # Directional cone
-    direction_angle = DIRECTION_ANGLES.get(direction.lower(), 0)
-    # angle_rad = math.radians(direction_angle)
-
-    # Cone parameters
-    cone_length = 52  # 75% larger cone
-    cone_width_degrees = 25  # Half-width of the cone's base in degrees
-
-    # Calculate the three points of the cone
-    # Point 1: Tip of the cone (at the center of the circle)
+    # Directional cone: tip at the center, base corners from the cached offsets
+    (dx2, dy2), (dx3, dy3) = _cone_base_offsets(direction_to_angle(direction))
     p1 = (center_x, center_y)
-
-    # Point 2: Base of the cone
-    angle2 = math.radians(direction_angle - cone_width_degrees)
-    p2 = (
-        center_x + cone_length * math.sin(angle2),
-        center_y - cone_length * math.cos(angle2),
-    )
-
-    # Point 3: Base of the cone
-    angle3 = math.radians(direction_angle + cone_width_degrees)
-    p3 = (
-        center_x + cone_length * math.sin(angle3),
-        center_y - cone_length * math.cos(angle3),
-    )
+    p2 = (center_x + dx2, center_y + dy2)
+    p3 = (center_x + dx3, center_y + dy3)
 
     draw.polygon([p1, p2, p3], fill="hotpink", outline="black")
 
     logger.info(f"Directional cone added pointing {direction}")
 
 
-def _analyze_annular_zone(
-    image_array: np.ndarray,
-    center_x: int,
-    center_y: int,
-    height: int,
-    width: int,
-    inner_radius: int,
-    outer_radius: int,
+def _analyze_zone(
+    zone_counts: np.ndarray,
     zone_name: str,
     traffic_analysis: Dict[str, Any],
-    excluded_pixels: Optional[set[Tuple[int, int]]] = None,
 ):
     """
-    Analyzes an annular (ring-shaped) zone for traffic colors, excluding specified pixels.
+    Scores one zone from its color histogram and records it in traffic_analysis.
     """
-    if excluded_pixels is None:
-        excluded_pixels = set()
-
-    zone_colors = []
-    pixels_in_zone = 0
-
-    for y in range(
-        max(0, center_y - outer_radius), min(height, center_y + outer_radius + 1)
-    ):
-        for x in range(
-            max(0, center_x - outer_radius), min(width, center_x + outer_radius + 1)
-        ):
-            distance = math.sqrt((x - center_x) ** 2 + (y - center_y) ** 2)
-            if (
-                inner_radius < distance <= outer_radius
-                and (x, y) not in excluded_pixels
-            ):
-                rgb = tuple(image_array[y, x][:3])
-                color_type = classify_traffic_color(rgb)
-                zone_colors.append(color_type)
-                pixels_in_zone += 1
-
     # Calculate zone score, ignoring gray pixels
-    non_gray_colors = [c for c in zone_colors if c != "gray"]
-    if non_gray_colors:
-        color_counts = Counter(non_gray_colors)
-        zone_score = sum(
-            count * TRAFFIC_SCORES[color] for color, count in color_counts.items()
-        ) / len(non_gray_colors)
-    else:
-        zone_score = 0  # If only gray pixels, score is 0
+    zone_score, pixels_in_zone, zone_colors = score_counts(zone_counts)
 
     traffic_analysis["area_scores"][zone_name] = {
         "score": zone_score,
         "pixels": pixels_in_zone,
-        "colors": dict(Counter(zone_colors)),  # Report all colors, even gray
+        "colors": zone_colors,  # Report all colors, even gray
     }
 
-    # Update overall color distribution
-    for color, count in Counter(zone_colors).items():
-        traffic_analysis["color_distribution"][color] += count
     logger.info(
         f"Analyzed {zone_name} zone: Score={zone_score}, Pixels={pixels_in_zone}"
     )
 
 
 def find_storefront_traffic(
-    image_array: np.ndarray,
+    labels: np.ndarray,
     center_x: int,
     center_y: int,
     storefront_direction: str,
     max_distance: int = 50,
-) -> Tuple[Dict[str, Any], set[Tuple[int, int]]]:
+) -> Tuple[Dict[str, Any], np.ndarray]:
     """
     Find the closest traffic color to the center point using a cone search.
 
     Args:
-        image_array: The image as a numpy array.
+        labels: Pixel labels of the image, from build_label_map.
         center_x, center_y: Center coordinates of the image.
         storefront_direction: Direction the storefront faces (e.g., 'north', 'northeast').
         max_distance: Maximum distance to search in pixels (default 50m).
@@ -575,73 +897,84 @@ def find_storefront_traffic(
     Returns:
         A tuple containing:
         - A dictionary with the storefront analysis results.
-        - A set of (x, y) coordinates of pixels checked within the cone.
+        - A boolean mask (same shape as labels) of the pixels inside the cone.
     """
-    height, width = image_array.shape[:2]
-    checked_cone_pixels = set()
+    height, width = labels.shape
 
-    # Define angle ranges for cone search based on storefront direction
     # Cone width is 60 degrees (30 degrees on each side of the center direction)
-    direction_angle = DIRECTION_ANGLES.get(storefront_direction.lower(), 0)
-    min_angle = (direction_angle - 30 + 360) % 360
-    max_angle = (direction_angle + 30) % 360
-
-    # Adjust for wrapping around 0/360 degrees
-    angle_range = []
-    if min_angle < max_angle:
-        angle_range = range(min_angle, max_angle + 1, 5)
-    else:  # Case where cone crosses the 0/360 boundary (e.g., north: 330-30)
-        angle_range = list(range(min_angle, 360, 5)) + list(range(0, max_angle + 1, 5))
-
-    # Search in an expanding cone for the first non-gray pixel
-    for distance in range(1, max_distance + 1):  # Include max_distance
-        for angle in angle_range:
-            angle_rad = math.radians(angle)
-            x = int(
-                center_x + distance * math.sin(angle_rad)
-            )  # Swapped sin/cos for correct orientation
-            y = int(
-                center_y - distance * math.cos(angle_rad)
-            )  # Y is inverted in image coordinates
-
-            if 0 <= x < width and 0 <= y < height:
-                checked_cone_pixels.add((x, y))  # Add pixel to set of checked pixels
-                rgb = tuple(image_array[y, x][:3])
-                color_type = classify_traffic_color(rgb)
-
-                if color_type != "gray":
-                    logger.info(
-                        f"Storefront traffic found: {color_type} at distance {distance}px in {storefront_direction} cone"
-                    )
-                    return {
-                        "found": True,
-                        "color": color_type,
-                        "distance": distance,
-                        "score": TRAFFIC_SCORES[color_type],
-                    }, checked_cone_pixels
-
-    # If no traffic is found, return default gray score and all checked pixels
+    direction_angle = direction_to_angle(storefront_direction)
+
+    # Only the window around the center can be inside the cone
+    y0, y1 = max(0, center_y - max_distance), min(height, center_y + max_distance + 1)
+    x0, x1 = max(0, center_x - max_distance), min(width, center_x + max_distance + 1)
+    yy, xx = np.ogrid[y0:y1, x0:x1]
+    dx, dy = xx - center_x, yy - center_y
+    d2 = dx**2 + dy**2
+
+    # Compass bearing of each pixel: 0 is up (north), Y is inverted in images
+    angle = np.degrees(np.arctan2(dx, -dy)) % 360
+    delta = np.minimum((angle - direction_angle) % 360, (direction_angle - angle) % 360)
+    window_cone = (delta <= 30) & (d2 <= max_distance**2) & (d2 > 0)
+
+    cone_mask = np.zeros((height, width), dtype=bool)
+    cone_mask[y0:y1, x0:x1] = window_cone
+
+    # Closest non-gray pixel inside the cone
+    candidates = window_cone & (labels[y0:y1, x0:x1] != GRAY_ID)
+    if candidates.any():
+        idx = np.argmin(np.where(candidates, d2, np.iinfo(d2.dtype).max))
+        y, x = np.unravel_index(idx, candidates.shape)
+        label_id = int(labels[y0 + y, x0 + x])
+        color_type = TRAFFIC_LABELS[label_id]
+        distance = round(math.sqrt(d2[y, x]))
+        logger.info(
+            f"Storefront traffic found: {color_type} at distance {distance}px in {storefront_direction} cone"
+        )
+        return {
+            "found": True,
+            "color": color_type,
+            "distance": distance,
+            "score": int(SCORES_VEC[label_id]),
+        }, cone_mask
+
+    # If no traffic is found, return default gray score and the cone
     return {
         "found": False,
         "color": "gray",
         "distance": max_distance,
         "score": 0,
-    }, checked_cone_pixels
+    }, cone_mask
 
 
 def analyze_traffic_in_image(
-    image_path: str,
+    image: Union[str, Image.Image, np.ndarray],
     center_lat: float,
     center_lng: float,
     storefront_direction: str = "north",
 ) -> Dict[str, Any]:
-    """Analyze traffic colors in the screenshot image with circular storefront detection"""
+    """
+    Analyze traffic colors in the screenshot image with circular storefront detection.
+    `image` is a file path, a PIL image or an already decoded HxWx3/4 array.
+    """
     try:
         # Load the image
-        image = Image.open(image_path)
-        image_array = np.array(image)
+        if isinstance(image, str):
+            with Image.open(image) as opened:
+                return analyze_traffic_in_image(
+                    opened, center_lat, center_lng, storefront_direction
+                )
+
+        if isinstance(image, Image.Image):
+            width, height = image.size
+            channels = len(image.getbands())
+        else:
+            height, width = image.shape[:2]
+            channels = image.shape[2] if image.ndim == 3 else 1
+
+        if channels < 3:
+            logger.error(f"Not an RGB image: {channels} channel(s)")
+            return {}
 
-        height, width = image_array.shape[:2]
         center_x, center_y = width // 2, height // 2
 
         # Define analysis zones (in pixels from center)
@@ -660,17 +993,36 @@ def analyze_traffic_in_image(
             150 * pixels_per_meter
         )  # Outer radius for 100m-150m ring
 
+        if min(height, width) < 2 * outer_150m_zone_radius_px:
+            logger.error(f"Image {width}x{height} does not cover the 150m zone")
+            return {}
+
+        # Nothing past the 150m ring is scored: classify only that window.
+        # A PIL image is cropped first, so only the window is copied out.
+        r = outer_150m_zone_radius_px
+        y0, x0 = max(0, center_y - r), max(0, center_x - r)
+        y1, x1 = min(height, center_y + r + 1), min(width, center_x + r + 1)
+        if isinstance(image, Image.Image):
+            window = np.asarray(image.crop((x0, y0, x1, y1)))
+        else:
+            window = image[y0:y1, x0:x1]
+        labels = build_label_map(
+            window, out=_scratch("labels", window.shape[:2], np.int8)
+        )
+        height, width = labels.shape
+        center_x, center_y = center_x - x0, center_y - y0
+
         traffic_analysis = {
             "storefront_score": 0,
             "area_scores": {},
             "total_pixels_analyzed": 0,
-            "color_distribution": {color: 0 for color in TRAFFIC_COLORS.keys()},
+            "color_distribution": {},
             "storefront_details": {},
         }
 
         # Find storefront traffic using cone search
-        storefront_result, cone_pixels_checked = find_storefront_traffic(
-            image_array,
+        storefront_result, cone_mask = find_storefront_traffic(
+            labels,
             center_x,
             center_y,
             storefront_direction,
@@ -680,83 +1032,34 @@ def analyze_traffic_in_image(
         traffic_analysis["storefront_details"] = storefront_result
         traffic_analysis["storefront_score"] = storefront_result["score"]
 
+        # Color distribution by label id, turned into a dict on return
+        distribution = np.zeros(len(TRAFFIC_LABELS), np.int64)
+
         # Update color distribution with storefront findings
         if storefront_result["found"]:
-            traffic_analysis["color_distribution"][storefront_result["color"]] += 1
-
-        # Analyze the 50m area (full circle excluding the cone)
-        zone_colors_50m_full_circle = []
-        pixels_in_zone_50m_full_circle = 0
-        for y in range(
-            max(0, center_y - full_50m_circle_radius_px),
-            min(height, center_y + full_50m_circle_radius_px + 1),
-        ):
-            for x in range(
-                max(0, center_x - full_50m_circle_radius_px),
-                min(width, center_x + full_50m_circle_radius_px + 1),
-            ):
-                distance = math.sqrt((x - center_x) ** 2 + (y - center_y) ** 2)
-                if (
-                    distance <= full_50m_circle_radius_px
-                    and (x, y) not in cone_pixels_checked
-                ):
-                    rgb = tuple(image_array[y, x][:3])
-                    color_type = classify_traffic_color(rgb)
-                    zone_colors_50m_full_circle.append(color_type)
-                    pixels_in_zone_50m_full_circle += 1
-
-        non_gray_colors_50m_full_circle = [
-            c for c in zone_colors_50m_full_circle if c != "gray"
-        ]
-        if non_gray_colors_50m_full_circle:
-            color_counts_50m_full_circle = Counter(non_gray_colors_50m_full_circle)
-            zone_score_50m_full_circle = sum(
-                count * TRAFFIC_SCORES[color]
-                for color, count in color_counts_50m_full_circle.items()
-            ) / len(non_gray_colors_50m_full_circle)
-        else:
-            zone_score_50m_full_circle = 0
-
-        traffic_analysis["area_scores"]["50m"] = {
-            "score": zone_score_50m_full_circle,
-            "pixels": pixels_in_zone_50m_full_circle,
-            "colors": dict(Counter(zone_colors_50m_full_circle)),
-        }
-        for color, count in Counter(zone_colors_50m_full_circle).items():
-            traffic_analysis["color_distribution"][color] += count
-        logger.info(
-            f"Analyzed 50m full circle (excluding cone) zone: Score={zone_score_50m_full_circle}, Pixels={pixels_in_zone_50m_full_circle}"
-        )
-
-        # Analyze the 100m area (annular region from 50m to 100m)
-        _analyze_annular_zone(
-            image_array,
-            center_x,
-            center_y,
-            height,
-            width,
-            full_50m_circle_radius_px,
-            outer_100m_zone_radius_px,
-            "100m",
-            traffic_analysis,
-        )
-
-        # Analyze the 150m area (annular region from 100m to 150m)
-        _analyze_annular_zone(
-            image_array,
-            center_x,
-            center_y,
-            height,
-            width,
-            outer_100m_zone_radius_px,
-            outer_150m_zone_radius_px,
-            "150m",
-            traffic_analysis,
-        )
-
-        traffic_analysis["total_pixels_analyzed"] = sum(
-            traffic_analysis["color_distribution"].values()
+            distribution[TRAFFIC_LABELS.index(storefront_result["color"])] += 1
+
+        # Zone id per pixel: 0 = 50m circle, 1 = 50m-100m ring,
+        # 2 = 100m-150m ring, 3 = outside (not counted)
+        radii_sq = (
+            full_50m_circle_radius_px**2,
+            outer_100m_zone_radius_px**2,
+            outer_150m_zone_radius_px**2,
         )
+        zones = _scratch("zones", labels.shape, np.int8)
+        np.copyto(zones, _radial_zones(height, width, center_x, center_y, radii_sq))
+        # The 50m area is the full circle excluding the cone
+        zones[cone_mask & (zones == 0)] = len(radii_sq)
+
+        counts = zone_color_counts(labels, zones, len(radii_sq))
+        for zone_name, zone_counts in zip(("50m", "100m", "150m"), counts):
+            _analyze_zone(zone_counts, zone_name, traffic_analysis)
+        distribution += counts.sum(axis=0)
+
+        traffic_analysis["color_distribution"] = {
+            color: int(count) for color, count in zip(TRAFFIC_LABELS, distribution)
+        }
+        traffic_analysis["total_pixels_analyzed"] = int(distribution.sum())
 
         return traffic_analysis
 
@@ -836,6 +1139,7 @@ def analyze_location_traffic(
     target_time: Optional[str] = None,
     selenium_url: Optional[str] = None,
     proxy: Optional[str] = None,
+    driver: Optional[webdriver.Remote] = None,
 ) -> Dict[str, Any]:
     """
     Main method to analyze traffic using Google Maps screenshots
@@ -847,13 +1151,18 @@ def analyze_location_traffic(
         storefront_direction: Direction the storefront faces (n, ne, e, se, s, sw, w, nw) # Documented
         day_of_week: Day of week for historical traffic (e.g., 'Monday', 0-6)
         target_time: Target Time for historical traffic ('8:30AM', '6:00PM', '10:00PM')
+        driver: Optional existing webdriver session; when given it is reused and
+                left open for the caller, otherwise one is borrowed from the
+                module's session pool (TRAFFIC_DRIVER_POOL sessions)
 
     Returns:
         Dict containing traffic analysis results
     """
 
-    # Setup webdriver
-    driver = setup_webdriver(selenium_url, proxy)
+    # Borrow a pooled webdriver unless the caller lends us one
+    owns_driver = driver is None
+    if owns_driver:
+        driver = _driver_pool.acquire(selenium_url, proxy)
 
     if not driver:
         error_msg = f"Failed to setup webdriver for location ({lat}, {lng}). Check if Selenium Grid is accessible at {selenium_url}"
@@ -862,7 +1171,7 @@ def analyze_location_traffic(
 
     try:
         # Capture screenshot
-        screenshot_path, live_traffic = capture_google_maps_screenshot(
+        image, live_traffic = capture_google_maps_screenshot(
             driver,
             lat,
             lng,
@@ -870,62 +1179,42 @@ def analyze_location_traffic(
             target_time=target_time,
         )
 
-        if not screenshot_path:
-            error_msg = f"Failed to capture screenshot for location ({lat}, {lng}). Check Google Maps accessibility and browser automation."
-            logger.error(error_msg)
-            raise Exception(error_msg)
+        if image is None:
+            raise RuntimeError(
+                "Failed to capture screenshot. Check Google Maps accessibility and browser automation."
+            )
 
         # Add pin to image for verification, passing storefront_direction
-        pinned_screenshot_path = add_pin_to_image(screenshot_path, storefront_direction)
+        try:
+            draw_pin(image, storefront_direction)
+        except Exception as e:
+            logger.error(f"Failed to add pin to image: {e}")
 
         # Analyze traffic in the image, passing storefront_direction
-        analysis = analyze_traffic_in_image(
-            pinned_screenshot_path, lat, lng, storefront_direction
-        )
+        analysis = analyze_traffic_in_image(image, lat, lng, storefront_direction)
 
         if not analysis:
-            error_msg = f"Failed to analyze traffic in screenshot for location ({lat}, {lng}). Image analysis returned no results."
-            logger.error(error_msg)
-            raise Exception(error_msg)
+            raise RuntimeError(
+                "Failed to analyze traffic in screenshot. Image analysis returned no results."
+            )
 
         # Calculate final score
         result = calculate_final_traffic_score(analysis)
 
-        # Cleanup original screenshot
-        if (
-            os.path.exists(screenshot_path)
-            and screenshot_path != pinned_screenshot_path
-        ):
-            os.remove(screenshot_path)
-
-        # Handle static file saving
-        if save_to_static:
-            static_dir = os.path.join(
-                os.path.abspath(os.path.dirname(__file__)),
-                "static",
-                "images",
-                "traffic_screenshots",
-            )
-            os.makedirs(static_dir, exist_ok=True)
-
-            static_filename = os.path.basename(pinned_screenshot_path)
-            static_path = os.path.join(static_dir, static_filename)
-
-            shutil.copy2(pinned_screenshot_path, static_path)
-            result["screenshot_path"] = static_path
-        else:
-            result["screenshot_path"] = pinned_screenshot_path
+        # Write the pinned screenshot once, where it will be served from
+        screenshot_path = os.path.join(
+            screenshots_dir(save_to_static),
+            screenshot_filename(lat, lng, day_of_week, target_time),
+        )
+        image.save(screenshot_path, compress_level=1)
+        result["screenshot_path"] = screenshot_path
 
         # Add metadata
-        result.update(
-            {
-                "method": "google_maps_screenshot",
-                "coordinates": {"lat": lat, "lng": lng},
-                "analysis_timestamp": time.time(),
-                "storefront_details": analysis.get("storefront_details", {}),
-                "traffic_type": "live" if live_traffic else "typical",
-            }
-        )
+        result["method"] = "google_maps_screenshot"
+        result["coordinates"] = {"lat": lat, "lng": lng}
+        result["analysis_timestamp"] = time.time()
+        result["storefront_details"] = analysis.get("storefront_details", {})
+        result["traffic_type"] = "live" if live_traffic else "typical"
 
         logger.info(
             f"Google Maps traffic analysis completed for {lat}, {lng}: Score {result['score']}"
@@ -933,11 +1222,57 @@ def analyze_location_traffic(
         return result
 
     except Exception as e:
+        # Only a broken session is quit; after any other failure the browser
+        # goes back to the pool (release still health-checks it)
+        if owns_driver and is_webdriver_error(e):
+            logger.warning(f"Selenium session failed, discarding it: {e}")
+            _driver_pool.discard(driver)
+            owns_driver = False
+        # The single place a failed location is logged, with its traceback
         error_msg = (
             f"Google Maps traffic analysis failed for location ({lat}, {lng}): {str(e)}"
         )
-        logger.error(error_msg)
+        logger.exception(error_msg)
         raise Exception(error_msg) from e
 
     finally:
-        cleanup_webdriver(driver)
+        if owns_driver:
+            _driver_pool.release(driver)
+
+
+def analyze_locations_traffic(
+    points: Sequence[Tuple],
+    max_workers: int = 8,
+    save_to_static: bool = False,
+    selenium_url: Optional[str] = None,
+    proxy: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Analyze many locations in parallel, one thread and Grid session per location
+
+    Args:
+        points: (lat, lng[, storefront_direction[, day_of_week[, target_time]]])
+        max_workers: threads capturing at once. The Grid's free session slots
+                     (nodes x max sessions) bound the useful value, and so does
+                     TRAFFIC_DRIVER_POOL, since every thread borrows a pooled session
+
+    Returns:
+        One result per point, in order; a failed point gives {"error": message}
+    """
+
+    def analyze(point):
+        lat, lng, *options = point
+        try:
+            return analyze_location_traffic(
+                lat,
+                lng,
+                save_to_static,
+                *options,
+                selenium_url=selenium_url,
+                proxy=proxy,
+            )
+        except Exception as e:
+            return {"error": str(e)}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(analyze, points))
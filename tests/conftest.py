@@ -1,33 +1,54 @@
 #!/usr/bin/python3
 # -*- coding: utf-8 -*-
 
+import asyncio
 import os
 import sys
+import tempfile
 
 from sqlalchemy.util import md5_hex
 
+# Run against a throwaway database; must be set before config is imported
+os.environ.setdefault(
+    "SQLITE_DB_FILE", os.path.join(tempfile.mkdtemp(prefix="traffic_api_"), "test.db")
+)
+
 # Add the parent directory to sys.path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 import pytest
+from sqlalchemy import select
 
-from db import Base, SessionLocal, engine
+from db import AsyncSessionLocal, Base, engine
 from models_db import User
 
 
+async def _create_db():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    # Insert default admin if not exists
+    async with AsyncSessionLocal() as db:
+        if not await db.scalar(select(User).filter_by(username="admin")):
+            db.add(User(username="admin", hashed_password=md5_hex("password123")))
+            await db.commit()
+
+    # Pooled connections belong to this event loop: don't hand them to tests
+    await engine.dispose()
+
+
+async def _drop_db():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    await engine.dispose()
+
+
 @pytest.fixture(scope="session", autouse=True)
 def setup_db():
     # Create tables
-    Base.metadata.create_all(bind=engine)
-
-    # Insert default admin if not exists
-    db = SessionLocal()
-    if not db.query(User).filter_by(username="admin").first():
-        db.add(User(username="admin", hashed_password=md5_hex("password123")))
-        db.commit()
-    db.close()
+    asyncio.run(_create_db())
 
     yield
 
     # Teardown (optional)
-    Base.metadata.drop_all(bind=engine)
+    asyncio.run(_drop_db())
@@ -0,0 +1,54 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import pytest
+import pytest_asyncio
+from sqlalchemy.util import md5_hex
+
+from auth import authenticate_user, hash_password, pwd_context, verify_password
+from db import AsyncSessionLocal, engine
+from models_db import User
+
+
+@pytest_asyncio.fixture
+async def db():
+    async with AsyncSessionLocal() as session:
+        yield session
+    # Connections are bound to this test's event loop
+    await engine.dispose()
+
+
+def test_bcrypt_hash_round_trip():
+    hashed = hash_password("s3cret")
+
+    assert pwd_context.identify(hashed) == "bcrypt"
+    assert hashed != hash_password("s3cret")  # salted
+    assert verify_password("s3cret", hashed)
+    assert not verify_password("wrong", hashed)
+
+
+def test_legacy_md5_hash_verifies():
+    hashed = md5_hex("s3cret")
+
+    assert verify_password("s3cret", hashed)
+    assert not verify_password("wrong", hashed)
+    assert pwd_context.needs_update(hashed)
+
+
+def test_unknown_hash_does_not_verify():
+    assert not verify_password("s3cret", "")
+    assert not verify_password("s3cret", "not-a-hash")
+
+
+@pytest.mark.asyncio
+async def test_login_upgrades_legacy_hash(db):
+    db.add(User(username="legacy", hashed_password=md5_hex("s3cret")))
+    await db.commit()
+
+    assert await authenticate_user("legacy", "wrong", db) is None
+    user = await authenticate_user("legacy", "s3cret", db)
+
+    assert user is not None
+    assert pwd_context.identify(user.hashed_password) == "bcrypt"
+    # The upgraded hash still logs in
+    assert await authenticate_user("legacy", "s3cret", db) is not None
@@ -0,0 +1,131 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+import json
+
+import pytest
+
+import main
+from jobs import AsyncJobQueue, JobStatusEnum
+
+
+async def _fake_worker(lat, lng, *args):
+    return {"score": lat + lng, "method": "mock"}
+
+
+def _payload(*coords):
+    locations = [{"lat": lat, "lng": lng} for lat, lng in coords]
+    return {"locations": locations, "count": len(locations), "user_id": 1}
+
+
+async def _wait_finished(queue: AsyncJobQueue, job_id: str):
+    for _ in range(100):
+        job = await queue.get(job_id)
+        if job is None or job["status"] not in (
+            JobStatusEnum.PENDING,
+            JobStatusEnum.RUNNING,
+        ):
+            return job
+        await asyncio.sleep(0.01)
+    pytest.fail("Job did not finish in time")
+
+
+@pytest.mark.asyncio
+async def test_evicted_jobs_are_handed_to_on_evict():
+    evicted = []
+
+    async def on_evict(job_id, job):
+        evicted.append((job_id, job["status"], job["result"]["count"]))
+
+    queue = AsyncJobQueue(_fake_worker, max_tracked_jobs=1, on_evict=on_evict)
+    await queue.start()
+    try:
+        first = await queue.submit(_payload((1, 1)))
+        await _wait_finished(queue, first)
+        second = await queue.submit(_payload((2, 2), (3, 3)))
+        await _wait_finished(queue, second)
+        await asyncio.sleep(0)
+    finally:
+        await queue.stop()
+
+    # The oldest finished job was evicted first, the other one on stop()
+    assert evicted == [
+        (first, JobStatusEnum.DONE, 1),
+        (second, JobStatusEnum.DONE, 2),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_expired_jobs_are_handed_to_on_evict():
+    evicted = []
+
+    async def on_evict(job_id, job):
+        evicted.append(job_id)
+
+    queue = AsyncJobQueue(_fake_worker, job_ttl=0, on_evict=on_evict)
+    await queue.start()
+    gc = asyncio.create_task(queue._gc_loop(interval=0.01))
+    try:
+        job_id = await queue.submit(_payload((1, 1)))
+        await _wait_finished(queue, job_id)
+        for _ in range(100):
+            if evicted:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        gc.cancel()
+        await queue.stop()
+
+    assert evicted == [job_id]
+    assert await queue.get(job_id) is None
+
+
+@pytest.mark.asyncio
+async def test_collected_jobs_are_not_evicted():
+    evicted = []
+
+    async def on_evict(job_id, job):
+        evicted.append(job_id)
+
+    queue = AsyncJobQueue(_fake_worker, on_evict=on_evict)
+    await queue.start()
+    job_id = await queue.submit(_payload((1, 1)))
+    await _wait_finished(queue, job_id)
+    await queue.remove(job_id)
+    await queue.stop()
+
+    assert evicted == []
+
+
+async def _next_event(events) -> dict:
+    chunk = await asyncio.wait_for(events.__anext__(), timeout=1)
+    assert chunk.startswith("data: ")
+    return json.loads(chunk[len("data: ") :])
+
+
+@pytest.mark.asyncio
+async def test_stream_sends_changes_made_while_suspended(monkeypatch):
+    queue = AsyncJobQueue(_fake_worker)  # not started: jobs stay pending
+    monkeypatch.setattr(main, "job_queue", queue)
+    job_id = await queue.submit(_payload((1, 1), (2, 2)))
+    job = await queue.get(job_id)
+
+    response = await main.stream_job(job_id, user=None)
+    events = response.body_iterator
+    assert (await _next_event(events))["status"] == JobStatusEnum.PENDING
+
+    # The generator is suspended at yield: nobody waits on progress_event
+    job["status"] = JobStatusEnum.RUNNING
+    job["completed"] = 1
+    queue._notify(job)
+    event = await _next_event(events)
+    assert (event["status"], event["completed"]) == (JobStatusEnum.RUNNING, 1)
+
+    job["completed"] = 2
+    job["status"] = JobStatusEnum.DONE
+    queue._notify(job)
+    event = await _next_event(events)
+    assert (event["status"], event["completed"]) == (JobStatusEnum.DONE, 2)
+    with pytest.raises(StopAsyncIteration):
+        await events.__anext__()
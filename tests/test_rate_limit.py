@@ -0,0 +1,71 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+import rate_limit
+from rate_limit import RateLimiter, parse_rate
+
+
+class _Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock)
+    return clock
+
+
+def _request(host: str = "10.0.0.1"):
+    return SimpleNamespace(client=SimpleNamespace(host=host))
+
+
+@pytest.mark.parametrize(
+    "rate, expected",
+    [("10/minute", (10, 60)), ("5/second", (5, 1)), ("100 / Hours", (100, 3600))],
+)
+def test_parse_rate(rate, expected):
+    assert parse_rate(rate) == expected
+
+
+@pytest.mark.asyncio
+async def test_rejects_requests_over_the_limit(clock):
+    limiter = RateLimiter("3/minute")
+
+    for _ in range(3):
+        await limiter(_request())
+    with pytest.raises(HTTPException) as excinfo:
+        await limiter(_request())
+    assert excinfo.value.status_code == 429
+
+    # Other clients have their own counter
+    await limiter(_request("10.0.0.2"))
+
+
+@pytest.mark.asyncio
+async def test_resets_on_window_rollover(clock):
+    limiter = RateLimiter("2/minute")
+    clock.now = 60 * 100 + 59  # last second of a window
+
+    await limiter(_request())
+    await limiter(_request())
+    with pytest.raises(HTTPException):
+        await limiter(_request())
+
+    clock.now += 1  # next window
+    await limiter(_request())
+    await limiter(_request())
+    with pytest.raises(HTTPException):
+        await limiter(_request())
+
+    # Counters of older windows are dropped
+    assert all(bucket == 101 for _, bucket in limiter._counters)
@@ -0,0 +1,57 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import cachetools
+import pytest
+
+import async_worker
+from async_worker import run_single_location_blocking
+
+
+@pytest.fixture
+def scrapes(monkeypatch):
+    scrapes = []
+
+    async def fake_analyze(lat, lng, *args):
+        scrapes.append((lat, lng))
+        return {
+            "score": 42,
+            "traffic_type": "typical",
+            "analysis_timestamp": 1000.0 + len(scrapes),
+            "storefront_details": {"found": True},
+        }
+
+    monkeypatch.setattr(async_worker, "_analyze_location", fake_analyze)
+    monkeypatch.setattr(
+        async_worker,
+        "_result_cache",
+        cachetools.TLRUCache(maxsize=16, ttu=async_worker._result_expiry),
+    )
+    return scrapes
+
+
+@pytest.mark.asyncio
+async def test_cache_hit_is_marked_and_not_timestamped(scrapes):
+    fresh = await run_single_location_blocking(1.0, 2.0, "north", "Monday", "8AM")
+    cached = await run_single_location_blocking(1.00001, 2.0, "north", "Monday", "8AM")
+
+    assert scrapes == [(1.0, 2.0)]
+    assert fresh["analysis_timestamp"] == 1001.0
+    assert "from_cache" not in fresh
+    assert "analysis_timestamp" not in cached
+    assert cached["cached_at"] == 1001.0
+    assert cached["from_cache"] is True
+    assert cached["score"] == fresh["score"]
+
+
+@pytest.mark.asyncio
+async def test_cache_hits_do_not_share_nested_dicts(scrapes):
+    first = await run_single_location_blocking(1.0, 2.0, "north", None, None)
+    first["storefront_details"]["found"] = False
+
+    second = await run_single_location_blocking(1.0, 2.0, "north", None, None)
+    second["storefront_details"]["found"] = None
+    third = await run_single_location_blocking(1.0, 2.0, "north", None, None)
+
+    assert third["storefront_details"] == {"found": True}
+    assert len(scrapes) == 1
@@ -0,0 +1,193 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+import threading
+
+import pytest
+from selenium.common.exceptions import InvalidSessionIdException
+
+import async_worker
+import step2_traffic_analysis
+from async_worker import SeleniumSessionPool
+from step2_traffic_analysis import DriverPool, analyze_location_traffic
+
+
+class _FakeDriver:
+    def __init__(self, name: str):
+        self.name = name
+        self.quit = False
+        self.broken = False
+        self.session_id = name
+        self.alive = True  # False once the Grid dropped the session
+
+    def execute_script(self, script):
+        if not self.alive:
+            raise InvalidSessionIdException("invalid session id")
+        return 1
+
+    def get(self, url):
+        if self.broken:
+            raise InvalidSessionIdException("invalid session id")
+
+
+class _FakeGrid:
+    """Stands in for setup/reset/cleanup_webdriver; `gate` blocks their threads"""
+
+    def __init__(self):
+        self.started = []
+        self.healthy = True
+        self.broken = False  # started sessions fail on their first page load
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def setup(self, selenium_url, proxy):
+        self.gate.wait(5)
+        driver = _FakeDriver(f"session {len(self.started)}")
+        driver.broken = self.broken
+        self.started.append(driver)
+        return driver
+
+    def reset(self, driver):
+        self.gate.wait(5)
+        return self.healthy
+
+    def cleanup(self, driver):
+        driver.quit = True
+
+
+@pytest.fixture
+def grid(monkeypatch):
+    grid = _FakeGrid()
+    monkeypatch.setattr(step2_traffic_analysis, "setup_webdriver", grid.setup)
+    monkeypatch.setattr(step2_traffic_analysis, "reset_webdriver", grid.reset)
+    monkeypatch.setattr(step2_traffic_analysis, "cleanup_webdriver", grid.cleanup)
+    yield grid
+    grid.gate.set()
+
+
+async def _until(condition):
+    for _ in range(200):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    pytest.fail("Condition not reached in time")
+
+
+@pytest.mark.asyncio
+async def test_released_sessions_are_reused(grid):
+    pool = SeleniumSessionPool(1, "http://grid")
+
+    driver = await pool.acquire("proxy-a")
+    await pool.release(driver)
+    assert await pool.acquire("proxy-a") is driver
+
+    # A session that fails its reset is quit, not kept
+    grid.healthy = False
+    await pool.release(driver)
+    assert driver.quit
+    assert pool.discarded == 1
+    assert await pool.acquire("proxy-a") is not driver
+
+
+@pytest.mark.asyncio
+async def test_session_expired_while_idle_is_replaced(grid):
+    pool = SeleniumSessionPool(1, "http://grid")
+    driver = await pool.acquire()
+    await pool.release(driver)
+
+    driver.alive = False  # Grid node idle timeout
+    replacement = await pool.acquire()
+
+    assert replacement is grid.started[1]
+    assert driver.quit
+    assert pool.discarded == 1
+    await pool.release(replacement)
+    assert await pool.acquire() is replacement
+
+
+@pytest.mark.asyncio
+async def test_idle_session_of_other_proxy_is_recycled(grid):
+    pool = SeleniumSessionPool(1, "http://grid")
+
+    driver = await pool.acquire("proxy-a")
+    await pool.release(driver)
+    other = await pool.acquire("proxy-b")
+
+    assert other is not driver
+    assert driver.quit
+    assert pool.discarded == 0
+
+
+@pytest.mark.asyncio
+async def test_open_sessions_never_exceed_the_pool_size(grid):
+    pool = SeleniumSessionPool(2, "http://grid")
+    held = [await pool.acquire("proxy-a") for _ in range(2)]
+    for driver in held:
+        await pool.release(driver)
+
+    # Another proxy while every Grid slot holds an idle session: recycle them
+    held = await asyncio.gather(*(pool.acquire("proxy-b") for _ in range(2)))
+
+    assert set(held) == set(grid.started[2:])
+    assert sum(not driver.quit for driver in grid.started) == 2
+
+
+@pytest.mark.asyncio
+async def test_canceled_release_still_returns_the_slot(grid):
+    pool = SeleniumSessionPool(1, "http://grid")
+    driver = await pool.acquire()
+
+    grid.gate.clear()
+    release = asyncio.create_task(pool.release(driver))
+    await asyncio.sleep(0.05)
+    release.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await release
+
+    grid.gate.set()
+    assert await asyncio.wait_for(pool.acquire(), 1) is driver
+
+
+@pytest.mark.asyncio
+async def test_canceled_acquire_quits_the_started_session(grid):
+    pool = SeleniumSessionPool(1, "http://grid")
+
+    grid.gate.clear()
+    acquire = asyncio.create_task(pool.acquire())
+    await asyncio.sleep(0.05)
+    acquire.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await acquire
+
+    grid.gate.set()
+    await _until(lambda: grid.started and grid.started[0].quit)
+    driver = await asyncio.wait_for(pool.acquire(), 1)
+    assert driver is grid.started[1]
+
+
+def test_selenium_error_discards_the_pooled_session(grid, monkeypatch):
+    pool = DriverPool(1)
+    monkeypatch.setattr(step2_traffic_analysis, "_driver_pool", pool)
+    grid.broken = True
+
+    with pytest.raises(Exception) as excinfo:
+        analyze_location_traffic(0, 0, selenium_url="http://grid")
+
+    assert isinstance(excinfo.value.__cause__, InvalidSessionIdException)
+    assert grid.started[0].quit
+    assert pool.discarded == 1
+
+
+@pytest.mark.asyncio
+async def test_selenium_error_discards_the_async_pooled_session(grid, monkeypatch):
+    pool = SeleniumSessionPool(1, "http://grid")
+    monkeypatch.setattr(async_worker, "selenium_pool", pool)
+    grid.broken = True
+
+    with pytest.raises(Exception) as excinfo:
+        await async_worker._analyze_location(0, 0, "north", None, None, None)
+
+    assert isinstance(excinfo.value.__cause__, InvalidSessionIdException)
+    assert grid.started[0].quit
+    assert pool.discarded == 1
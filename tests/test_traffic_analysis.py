@@ -0,0 +1,179 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import itertools
+import math
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import step2_traffic_analysis
+from step2_traffic_analysis import (
+    COLOR_HI,
+    COLOR_LO,
+    TRAFFIC_COLORS,
+    TRAFFIC_LABELS,
+    analyze_traffic_in_image,
+    build_label_map,
+    classify_traffic_color,
+    retry_exception,
+)
+
+
+def _boundary_pixels() -> np.ndarray:
+    """Every combination of channel values on and just past each color range edge"""
+    channels = []
+    for channel in range(3):
+        values = set()
+        for lo, hi in zip(COLOR_LO[:, channel], COLOR_HI[:, channel]):
+            values.update((int(lo) - 1, int(lo), int(hi), int(hi) + 1))
+        channels.append(sorted(v for v in values if 0 <= v <= 255))
+    return np.array(list(itertools.product(*channels)), np.uint8)
+
+
+def _fixture_image(width: int = 471, height: int = 460) -> np.ndarray:
+    """Map-like screenshot: gray background crossed by roads of every color"""
+    rng = np.random.default_rng(7)
+    image = np.full((height, width, 3), (240, 238, 232), np.uint8)
+    palette = [lo + (hi - lo) // 2 for lo, hi in zip(COLOR_LO, COLOR_HI)]
+
+    for i, color in enumerate(palette):
+        y = 40 + i * 80
+        image[y : y + 9, :] = color
+        x = 30 + i * 95
+        image[:, x : x + 7] = color
+
+    # Sprinkle noise so range edges and unmatched colors are covered too
+    ys = rng.integers(0, height, 4000)
+    xs = rng.integers(0, width, 4000)
+    image[ys, xs] = rng.integers(0, 256, (4000, 3))
+    return image
+
+
+def _reference_zone_counts(image: np.ndarray, direction_angle: int):
+    """Per-pixel zone colors computed the slow, obvious way"""
+    height, width = image.shape[:2]
+    center_x, center_y = width // 2, height // 2
+    counts = {zone: {} for zone in ("50m", "100m", "150m")}
+
+    for y in range(height):
+        for x in range(width):
+            dx, dy = x - center_x, y - center_y
+            d2 = dx * dx + dy * dy
+            if d2 > 225**2:
+                continue
+            if d2 <= 75**2:
+                angle = math.degrees(math.atan2(dx, -dy)) % 360
+                delta = min(
+                    (angle - direction_angle) % 360, (direction_angle - angle) % 360
+                )
+                if d2 > 0 and delta <= 30:
+                    continue  # inside the storefront cone
+                zone = "50m"
+            elif d2 <= 150**2:
+                zone = "100m"
+            else:
+                zone = "150m"
+            color = classify_traffic_color(*(int(c) for c in image[y, x, :3]))
+            counts[zone][color] = counts[zone].get(color, 0) + 1
+    return counts
+
+
+def test_label_map_matches_scalar_classifier():
+    pixels = _boundary_pixels()
+    labels = build_label_map(pixels.reshape(1, -1, 3))[0]
+
+    expected = [classify_traffic_color(*(int(c) for c in p)) for p in pixels]
+    assert [TRAFFIC_LABELS[i] for i in labels] == expected
+    # Every color is actually hit, including the gray fallback
+    assert set(expected) == set(TRAFFIC_COLORS)
+
+
+def test_label_map_fills_out_buffer():
+    image = _fixture_image()
+    out = np.empty(image.shape[:2], np.int8)
+
+    assert build_label_map(image, out=out) is out
+    assert np.array_equal(out, build_label_map(image))
+
+
+@pytest.mark.parametrize(
+    "direction, direction_angle", [("north", 0), ("ne", 45), ("west", 270)]
+)
+def test_zone_counts_match_reference(direction, direction_angle):
+    image = _fixture_image()
+    analysis = analyze_traffic_in_image(image, 0, 0, direction)
+
+    expected = _reference_zone_counts(image, direction_angle)
+    for zone, colors in expected.items():
+        assert analysis["area_scores"][zone]["colors"] == colors
+        assert analysis["area_scores"][zone]["pixels"] == sum(colors.values())
+
+    found = analysis["storefront_details"]["found"]
+    assert analysis["total_pixels_analyzed"] == sum(
+        sum(colors.values()) for colors in expected.values()
+    ) + int(found)
+
+
+def test_image_inputs_agree(tmp_path):
+    image = _fixture_image()
+    path = str(tmp_path / "shot.png")
+    Image.fromarray(image).save(path)
+
+    from_array = analyze_traffic_in_image(image, 0, 0, "east")
+    assert from_array
+    assert analyze_traffic_in_image(path, 0, 0, "east") == from_array
+    assert analyze_traffic_in_image(Image.fromarray(image), 0, 0, "east") == from_array
+    rgba = Image.fromarray(image).convert("RGBA")
+    assert analyze_traffic_in_image(rgba, 0, 0, "east") == from_array
+
+
+def test_degenerate_images_are_rejected():
+    assert analyze_traffic_in_image(np.zeros((100, 100, 3), np.uint8), 0, 0) == {}
+    assert analyze_traffic_in_image(Image.new("L", (500, 500)), 0, 0) == {}
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(step2_traffic_analysis.time, "sleep", sleeps.append)
+    return sleeps
+
+
+def _flaky(failures: int):
+    calls = []
+
+    def callback():
+        calls.append(None)
+        if len(calls) <= failures:
+            raise RuntimeError(f"failure {len(calls)}")
+        return "ok"
+
+    return callback, calls
+
+
+def test_retry_returns_first_success(sleeps):
+    callback, calls = _flaky(0)
+
+    assert retry_exception(callback, "test") == "ok"
+    assert len(calls) == 1
+    assert sleeps == []
+
+
+def test_retry_backs_off_exponentially(sleeps):
+    callback, calls = _flaky(2)
+
+    assert retry_exception(callback, "test", retry_count=3, backoff=0.5) == "ok"
+    assert len(calls) == 3
+    assert sleeps == [0.5, 1.0]
+
+
+def test_retry_reraises_last_error(sleeps):
+    callback, calls = _flaky(5)
+
+    with pytest.raises(RuntimeError, match="failure 3"):
+        retry_exception(callback, "test", retry_count=3, backoff=0.1)
+    assert len(calls) == 3
+    # No sleep after the final attempt
+    assert sleeps == [0.1, 0.2]
@@ -0,0 +1,148 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import secrets
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+
+import utils
+from db import AsyncSessionLocal, engine
+from jobs import JobStatusEnum
+from models_db import Job, User
+
+
+@pytest_asyncio.fixture
+async def db():
+    async with AsyncSessionLocal() as session:
+        yield session
+    # Connections are bound to this test's event loop
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def writer(monkeypatch):
+    writer = utils.JobUpdateWriter()
+    monkeypatch.setattr(utils, "job_writer", writer)
+    await writer.start()
+    yield writer
+    await writer.stop()
+
+
+async def _new_job(db) -> tuple:
+    user_id = await db.scalar(select(User.id).filter_by(username="admin"))
+    job_id = secrets.token_hex(8)
+    db.add(Job(uuid=job_id, status=JobStatusEnum.PENDING, user_id=user_id))
+    await db.commit()
+    return job_id, user_id
+
+
+def _finished_job(user_id: int, status=JobStatusEnum.DONE, error=None) -> dict:
+    locations = [{"lat": 1.0, "lng": 2.0}, {"lat": 3.0, "lng": 4.0}]
+    return {
+        "status": status,
+        "payload": {"locations": locations, "count": 2, "user_id": user_id},
+        "result": {
+            "count": 2,
+            "locations": [{"score": 10, "method": "mock"}, {"score": 20}],
+        },
+        "error": error,
+        "_logged_to_db": False,
+    }
+
+
+@pytest.mark.asyncio
+async def test_persist_job_stores_results_and_status(db, writer):
+    job_id, user_id = await _new_job(db)
+    job = _finished_job(user_id)
+
+    await utils.persist_job(db, job_id, job)
+    await utils.persist_job(db, job_id, job)  # second call is a no-op for rows
+    await writer.stop()
+
+    record = await utils.get_job_record(job_id, user_id)
+    assert record.status == JobStatusEnum.DONE
+    assert record.completed == 2
+    assert [loc["score"] for loc in record.result["locations"]] == [10, 20]
+    assert record.result["locations"][1]["lat"] == 3.0
+
+
+@pytest.mark.asyncio
+async def test_persist_failed_job_records_error(db, writer):
+    job_id, user_id = await _new_job(db)
+    job = _finished_job(user_id, JobStatusEnum.FAILED, "All 2 location(s) failed")
+
+    await utils.persist_job(db, job_id, job)
+    await writer.stop()
+
+    record = await utils.get_job_record(job_id, user_id)
+    assert record.status == JobStatusEnum.FAILED
+    assert record.error == "All 2 location(s) failed"
+    assert record.completed == 0
+
+
+@pytest.mark.asyncio
+async def test_writer_coalesces_updates_of_a_job(db, monkeypatch):
+    job_id, user_id = await _new_job(db)
+    other_id, _ = await _new_job(db)
+    writer = utils.JobUpdateWriter(batch_delay=0.05)
+    batches = []
+    write = writer._write
+
+    async def recording_write(batch):
+        batches.append({key: dict(values) for key, values in batch.items()})
+        await write(batch)
+
+    monkeypatch.setattr(writer, "_write", recording_write)
+    await writer.start()
+
+    writer.put(job_id, user_id, {"status": JobStatusEnum.RUNNING})
+    writer.put(other_id, user_id, {"status": JobStatusEnum.CANCELED})
+    writer.put(job_id, user_id, {"status": JobStatusEnum.FAILED, "error": "boom"})
+    await writer.stop()
+
+    # One batch, one entry per job, later values win
+    assert batches == [
+        {
+            (job_id, user_id): {"status": JobStatusEnum.FAILED, "error": "boom"},
+            (other_id, user_id): {"status": JobStatusEnum.CANCELED},
+        }
+    ]
+    result = await db.execute(
+        select(Job.uuid, Job.status).filter(Job.user_id == user_id)
+    )
+    rows = dict(result.all())
+    assert rows[job_id] == JobStatusEnum.FAILED
+    assert rows[other_id] == JobStatusEnum.CANCELED
+
+
+@pytest.mark.asyncio
+async def test_pending_updates_overlay_the_stored_job(db, monkeypatch):
+    job_id, user_id = await _new_job(db)
+    writer = utils.JobUpdateWriter()
+    monkeypatch.setattr(utils, "job_writer", writer)
+
+    # Not started: updates stay queued
+    await utils.update_job(job_id, user_id, status=JobStatusEnum.DONE)
+    assert writer.pending(job_id, user_id) == {"status": JobStatusEnum.DONE}
+    assert writer.pending("other", user_id) == {}
+
+    record = await utils.get_job_record(job_id, user_id)
+    assert record.status == JobStatusEnum.DONE
+    stored = await db.scalar(select(Job.status).filter(Job.uuid == job_id))
+    assert stored == JobStatusEnum.PENDING
+
+
+@pytest.mark.asyncio
+async def test_stop_flushes_queued_updates(db):
+    job_id, user_id = await _new_job(db)
+    writer = utils.JobUpdateWriter(batch_delay=10)
+    await writer.start()
+
+    writer.put(job_id, user_id, {"status": JobStatusEnum.DONE})
+    await writer.stop()
+
+    assert writer.pending(job_id, user_id) == {}
+    stored = await db.scalar(select(Job.status).filter(Job.uuid == job_id))
+    assert stored == JobStatusEnum.DONE
@@ -1,64 +1,219 @@
 #!/usr/bin/python3
 # -*- coding: utf-8 -*-
 
+import asyncio
+import json
+from typing import AsyncIterator, Dict, Optional, Tuple
+
 from config import logger
+from db import AsyncSessionLocal, engine
+from jobs import JobStatusEnum
 from models import TrafficResponse
 from models_db import Job, TrafficLog
-from sqlalchemy import select, update
+from sqlalchemy import func, insert, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+JobKey = Tuple[str, int]  # (job uuid, user id)
+
+# TrafficLog columns returned for each location of a job
+LOCATION_COLUMNS = (
+    TrafficLog.lat,
+    TrafficLog.lng,
+    TrafficLog.score,
+    TrafficLog.method,
+    TrafficLog.screenshot_url,
+    TrafficLog.details,
+)
+
+
+class JobUpdateWriter:
+    """
+    Write-behind queue for Job row updates.
+    Callers only record the new values; a background task collects them for
+    up to `batch_delay` seconds (or `batch_size` jobs), merges updates of the
+    same job (later values win) and writes each batch in a single commit.
+    """
+
+    def __init__(self, batch_size: int = 100, batch_delay: float = 0.05):
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._pending: Dict[JobKey, dict] = {}  # queued, not yet written
+        self._writing: Dict[JobKey, dict] = {}  # batch being committed
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Start the background writer"""
+        self._task = asyncio.create_task(self._run(), name="job-writer")
+
+    async def stop(self):
+        """Write everything still queued and stop the background writer"""
+        if self._task:
+            self._queue.put_nowait(None)
+            await self._task
+            self._task = None
+        if self._pending:
+            await self._write(self._take(list(self._pending)))
+
+    def put(self, job_id: str, user_id: int, values: dict) -> None:
+        """Queue `values` to be written to the job"""
+        key = (job_id, user_id)
+        if key in self._pending:
+            self._pending[key].update(values)
+        else:
+            self._pending[key] = dict(values)
+            self._queue.put_nowait(key)
+
+    def pending(self, job_id: str, user_id: int) -> dict:
+        """Values queued for the job that may not be in the database yet"""
+        key = (job_id, user_id)
+        return {**self._writing.get(key, {}), **self._pending.get(key, {})}
+
+    def _take(self, keys) -> Dict[JobKey, dict]:
+        self._writing = {
+            key: self._pending.pop(key) for key in keys if key in self._pending
+        }
+        return self._writing
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        running = True
+        while running:
+            keys = [await self._queue.get()]
+            deadline = loop.time() + self.batch_delay
+            # None is the stop signal from stop(): write what we have right away
+            while keys[-1] is not None and len(keys) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    keys.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            if keys[-1] is None:
+                keys.pop()
+                running = False
+            batch = self._take(keys)
+            if batch:
+                await self._write(batch)
+
+    async def _write(self, batch: Dict[JobKey, dict]) -> None:
+        try:
+            async with AsyncSessionLocal() as db:
+                for (job_id, user_id), values in batch.items():
+                    await db.execute(
+                        update(Job)
+                        .where(Job.uuid == job_id, Job.user_id == user_id)
+                        .values(**values)
+                    )
+                await db.commit()
+        except Exception as e:
+            logger.warning(f"Failed to update job(s) {[k[0] for k in batch]}: {e}")
+        finally:
+            self._writing = {}
 
-async def update_job(db: AsyncSession, job_id: str, user_id: int, **kwargs) -> None:
-    try:
-        stmt = (
-            update(Job)
-            .where(Job.uuid == job_id, Job.user_id == user_id)
-            .values(**kwargs)
-        )
-        await db.execute(stmt)
-        await db.commit()
-    except Exception as e:
-        logger.warning(f"Failed to update job {job_id}: {e}")
+
+job_writer = JobUpdateWriter()
+
+
+async def update_job(job_id: str, user_id: int, **kwargs) -> None:
+    """Queue an update of the job's row; it is written in the background"""
+    job_writer.put(job_id, user_id, kwargs)
+
+
+async def persist_job(db: AsyncSession, job_id: str, job: dict) -> None:
+    """Store a finished job's location results and final status"""
+    status = job["status"]
+    if status in (JobStatusEnum.DONE, JobStatusEnum.CANCELED) and not job.get(
+        "_logged_to_db"
+    ):
+        # Claimed before the first await so the rows are only written once
+        job["_logged_to_db"] = True
+        try:
+            job_pk = await db.scalar(select(Job.id).where(Job.uuid == job_id))
+            if job_pk is not None:
+                results = job["result"].get("locations", [])
+                payload_locations = job["payload"].get("locations", [])
+
+                rows = [
+                    {
+                        "lat": payload_locations[i].get("lat"),
+                        "lng": payload_locations[i].get("lng"),
+                        "score": res.get("score"),
+                        "method": res.get("method"),
+                        "screenshot_url": res.get("screenshot_url"),
+                        "details": res,
+                        "job_id": job_pk,
+                    }
+                    for i, res in enumerate(results)
+                    if i < len(payload_locations)
+                ]
+                if rows:
+                    await db.execute(insert(TrafficLog), rows)
+                    await db.commit()
+        except Exception as e:
+            job["_logged_to_db"] = False
+            logger.warning(f"DB log failed for job {job_id}: {e}")
+
+    await update_job(
+        job_id, job["payload"].get("user_id"), status=status, error=job["error"]
+    )
 
 
 async def get_job_record(
-    db: AsyncSession, job_id: str, user_id: int
+    job_id: str, user_id: int, include_locations: bool = True
 ) -> TrafficResponse:
     try:
-        result = await db.execute(
-            select(Job).filter(Job.user_id == user_id, Job.uuid == job_id)
-        )
-        job_record = result.scalar_one_or_none()
-
-        if job_record:
-            result = await db.execute(
-                select(TrafficLog).filter(TrafficLog.job_id == job_record.id)
-            )
-            traffic_logs = result.scalars().all()
-            traffic_logs_count = len(traffic_logs)
-
-            return TrafficResponse(
-                job_id=job_id,
-                status=job_record.status,
-                completed=traffic_logs_count,
-                locations_count=traffic_logs_count,
-                result={
-                    "count": traffic_logs_count,
-                    "locations": [
-                        {
-                            "lat": log.lat,
-                            "lng": log.lng,
-                            "score": log.score,
-                            "method": log.method,
-                            "screenshot_url": log.screenshot_url,
-                            "details": log.details,
-                        }
-                        for log in traffic_logs
-                    ],
-                },
-                error=job_record.error,
+        # Read-only lookup: plain connection, no ORM session or identity map
+        async with engine.connect() as conn:
+            # Job and its log count in one round-trip
+            result = await conn.execute(
+                select(Job.id, Job.status, Job.error, func.count(TrafficLog.id))
+                .outerjoin(TrafficLog, TrafficLog.job_id == Job.id)
+                .where(Job.uuid == job_id, Job.user_id == user_id)
+                .group_by(Job.id)
             )
+            job_record = result.one_or_none()
+
+            if job_record:
+                traffic_logs_count = job_record[3]
+                # Updates still queued in the writer are newer than the row
+                queued = job_writer.pending(job_id, user_id)
+
+                locations = []
+                if include_locations:
+                    # Only the response columns, as plain rows
+                    result = await conn.stream(
+                        select(*LOCATION_COLUMNS)
+                        .where(TrafficLog.job_id == job_record.id)
+                        .execution_options(yield_per=500)
+                    )
+                    locations = [row._asdict() async for row in result]
+
+                return TrafficResponse(
+                    job_id=job_id,
+                    status=queued.get("status", job_record.status),
+                    completed=traffic_logs_count,
+                    locations_count=traffic_logs_count,
+                    result={"count": traffic_logs_count, "locations": locations},
+                    error=queued.get("error", job_record.error),
+                )
 
     except Exception as e:
         logger.warning(f"Failed to get job record {job_id}: {e}")
     return None
+
+
+async def stream_job_locations(job_id: str, user_id: int) -> AsyncIterator[str]:
+    """Yield a job's stored locations as NDJSON lines, fetched in batches"""
+    async with engine.connect() as conn:
+        result = await conn.stream(
+            select(*LOCATION_COLUMNS)
+            .join(Job, TrafficLog.job_id == Job.id)
+            .where(Job.uuid == job_id, Job.user_id == user_id)
+            .execution_options(yield_per=500)
+        )
+        async for row in result:
+            yield json.dumps(row._asdict()) + "\n"